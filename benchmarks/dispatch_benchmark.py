@@ -0,0 +1,77 @@
+#!/usr/bin/env python3
+
+"""
+Measures CommandRouter dispatch latency as the number of registered commands
+grows. Every lookup is a trie walk or a dict hit, so the time per message
+should stay flat from a handful of commands to thousands.
+
+Usage:
+    python3 benchmarks/dispatch_benchmark.py [--iterations 200000]
+"""
+
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from command_router import CommandRouter
+
+
+def noop(*args):
+    pass
+
+
+def build_router(extra_commands):
+    router = CommandRouter(fallback=noop)
+    for prefix in ("sm,,", "cm", "pb,,", "cb,,", "chp,,", "chl"):
+        router.register_quick_command(prefix, noop)
+    router.register_menu({key: noop for key in "qbugx"})
+    router.register_menu({key: noop for key in "mbcjx"}, 'MENU', 'bbs')
+    router.register_step('MAIL', noop)
+    router.register_step('CHECK_MAIL', noop, step=1)
+
+    # Filler commands, menus and steps registered the way plugins would
+    for i in range(extra_commands):
+        router.register_quick_command(f"p{i},,", noop)
+        router.register_menu({str(i): noop}, f'PLUGIN_{i}')
+        router.register_step(f'PLUGIN_{i}', noop, step=1)
+    return router
+
+
+# (message, state) pairs covering each stage of the lookup order
+WORKLOAD = [
+    ("cb,,general", None),
+    ("chl", None),
+    ("b", {'command': 'MENU', 'menu': 'bbs', 'step': 1}),
+    ("q", None),
+    ("Hello there", {'command': 'MAIL', 'step': 3}),
+    ("2", {'command': 'CHECK_MAIL', 'step': 1}),
+    ("unknown", None),
+]
+
+
+def time_dispatch(router, iterations):
+    workload = [(message, message.lower().strip(), state) for message, state in WORKLOAD]
+    start = time.perf_counter()
+    for i in range(iterations):
+        message, message_lower, state = workload[i % len(workload)]
+        router.dispatch(1, message, message_lower, state, None, [])
+    return time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description="CommandRouter dispatch benchmark")
+    parser.add_argument('--iterations', type=int, default=200000)
+    args = parser.parse_args()
+
+    print(f"{'commands':>10} {'ns/dispatch':>12}")
+    for extra in (0, 10, 100, 1000, 10000):
+        router = build_router(extra)
+        elapsed = time_dispatch(router, args.iterations)
+        print(f"{extra + 6:>10} {elapsed / args.iterations * 1e9:>12.0f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,150 @@
+#!/usr/bin/env python3
+
+"""
+Replays BBS sync messages through message_processing.process_message into a
+scratch database and compares two storage configurations:
+
+  commit per row : the original setup, one plain sqlite3 connection in the
+                   default rollback-journal mode (synchronous=FULL) with a
+                   commit after every insert
+  group commit   : the current ConnectionManager (WAL, synchronous=NORMAL)
+                   with inserts group-committed by the WriteBatcher
+
+Both runs go through the same entry point, so the parsing, duplicate and
+tombstone checks are identical and only the storage path differs. Results
+depend heavily on the file system; use --dir to put the scratch database on
+the disk the BBS runs from rather than on a tmpfs.
+
+Usage:
+    python3 benchmarks/sync_ingest_benchmark.py [--messages 10000] [--dir PATH]
+"""
+
+import argparse
+import os
+import sqlite3
+import sys
+import tempfile
+import time
+import uuid
+from contextlib import contextmanager
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import db_operations
+from db_connection import ConnectionManager
+from message_processing import process_message
+from write_batcher import WriteBatcher
+
+
+class Interface:
+    nodes = {}
+    bbs_nodes = ()
+    sync_format = 'legacy'
+
+
+class RollbackJournalDatabase:
+    """
+    One plain sqlite3 connection for reads and writes, as db_operations used before the write batcher.
+    """
+
+    def __init__(self, db_file):
+        self.conn = sqlite3.connect(db_file, check_same_thread=False)
+
+    def reader(self):
+        return self.conn
+
+    @contextmanager
+    def writer(self):
+        yield self.conn
+        self.conn.commit()
+
+    def close(self):
+        self.conn.close()
+
+
+class CommittedWrite:
+    def __init__(self, rowcount):
+        self.rowcount = rowcount
+
+    def wait(self, timeout=None):
+        return self.rowcount
+
+
+class CommitPerRowWriter:
+    """
+    Stands in for the WriteBatcher with the original behaviour: execute and commit every statement on its own.
+    """
+
+    def __init__(self, database):
+        self.database = database
+
+    def submit(self, sql, params=(), on_commit=None):
+        conn = self.database.conn
+        rowcount = conn.execute(sql, params).rowcount
+        conn.commit()
+        if on_commit is not None:
+            on_commit(rowcount)
+        return CommittedWrite(rowcount)
+
+    def execute(self, sql, params=()):
+        return self.submit(sql, params).wait()
+
+    def flush(self):
+        pass
+
+    def stop(self):
+        pass
+
+
+def build_sync_messages(count):
+    messages = []
+    for i in range(count):
+        if i % 2:
+            messages.append(f"BULLETIN|General|N{i % 97:03d}|Subject {i}|Bulletin body number {i}|{uuid.uuid4()}")
+        else:
+            messages.append(f"MAIL|!{i:08x}|N{i % 97:03d}|!{(i * 7) % 50:08x}|Subject {i}|Mail body number {i}|{uuid.uuid4()}")
+    return messages
+
+
+def replay(database, writes, messages):
+    db_operations.database = database
+    db_operations.writes = writes
+    db_operations.initialize_database()
+
+    interface = Interface()
+    start = time.perf_counter()
+    for message in messages:
+        process_message(1, message, interface, is_sync_message=True)
+    writes.flush()
+    elapsed = time.perf_counter() - start
+
+    c = database.reader().cursor()
+    stored = c.execute("SELECT (SELECT COUNT(*) FROM bulletins) + (SELECT COUNT(*) FROM mail)").fetchone()[0]
+    db_operations.close_database()
+    if stored != len(messages):
+        raise RuntimeError(f"Stored {stored} of {len(messages)} messages")
+    return elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Sync ingest benchmark")
+    parser.add_argument("--messages", "-n", type=int, default=10000, help="Number of sync messages to replay")
+    parser.add_argument("--dir", default=None, help="Directory for the scratch databases (default: system temp dir)")
+    args = parser.parse_args()
+
+    messages = build_sync_messages(args.messages)
+    with tempfile.TemporaryDirectory(dir=args.dir) as scratch:
+        baseline = RollbackJournalDatabase(os.path.join(scratch, 'per_row.db'))
+        per_row = replay(baseline, CommitPerRowWriter(baseline), messages)
+
+        current = ConnectionManager(os.path.join(scratch, 'batched.db'))
+        batched = replay(current, WriteBatcher(current), messages)
+
+    print(f"Replayed {len(messages)} sync messages through process_message")
+    print(f"  commit per row : {per_row:8.2f}s  {len(messages) / per_row:10.0f} rows/sec")
+    print(f"  group commit   : {batched:8.2f}s  {len(messages) / batched:10.0f} rows/sec")
+    print(f"  speedup        : {per_row / batched:8.1f}x")
+
+
+if __name__ == "__main__":
+    main()
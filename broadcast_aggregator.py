@@ -0,0 +1,150 @@
+import logging
+import threading
+import time
+from collections import OrderedDict
+
+from meshtastic import BROADCAST_NUM
+
+import metrics
+from message_packer import pack_message
+
+
+class UrgentBroadcaster:
+    """
+    Coalesces urgent notifications into as few channel broadcasts as possible.
+
+    Notifications added within `window` seconds of the first one go out as a
+    single broadcast: one item is sent as its full message, several are
+    merged into a short list. A unique_id already announced within
+    `dedup_ttl` seconds is ignored, so the same urgent item arriving by
+    several paths (local post, sync, relays) is announced once. At most
+    `dedup_max` unique_ids are remembered; past that the oldest are
+    forgotten early.
+
+    Broadcasts draw on a budget of `budget_frames` radio frames per
+    `budget_period` seconds, refilled continuously. When the budget is spent
+    the broadcast is held back, and whatever arrives meanwhile is merged into
+    it, until enough of the budget has refilled.
+
+    Args:
+        send (callable): Called as send(text, destination, interface).
+        window (float): Seconds to wait for more notifications before broadcasting.
+        budget_frames (int): Frames that may be broadcast per budget_period.
+        budget_period (float): Seconds over which budget_frames refill.
+        dedup_ttl (float): Seconds a unique_id is remembered.
+        dedup_max (int): Most unique_ids remembered at once.
+        max_items (int): Items listed in a merged broadcast; the rest are counted.
+    """
+
+    def __init__(self, send, window=10.0, budget_frames=6, budget_period=600.0, dedup_ttl=3600.0, dedup_max=1000,
+                 max_items=5):
+        self.send = send
+        self.window = window
+        self.budget_frames = budget_frames
+        self.budget_period = budget_period
+        self.dedup_ttl = dedup_ttl
+        self.dedup_max = dedup_max
+        self.max_items = max_items
+        self._pending = []  # (message, summary, hint)
+        self._interface = None
+        self._timer = None
+        self._tokens = float(budget_frames)
+        self._refilled = time.monotonic()
+        self._seen = OrderedDict()  # unique_id -> when it was first announced
+        self._lock = threading.Lock()
+
+    def add(self, unique_id, message, summary, hint, interface):
+        """
+        Queues an urgent notification.
+
+        Args:
+            unique_id (str): Identifies the urgent item for deduplication.
+            message (str): Full notification, broadcast when it is the only item.
+            summary (str): One line describing the item in a merged broadcast.
+            hint (str): How to read the item, e.g. "DM 'CB,,Urgent' to view".
+            interface (meshtastic.stream_interface.StreamInterface): The Meshtastic interface object.
+
+        Returns:
+            bool: False if the item was already announced.
+        """
+        now = time.monotonic()
+        with self._lock:
+            self._forget(now)
+            if unique_id in self._seen:
+                metrics.increment('urgent.duplicates')
+                logging.info(f"Urgent notification for {unique_id} already sent, skipping")
+                return False
+            self._seen[unique_id] = now
+            self._pending.append((message, summary, hint))
+            self._interface = interface
+            if self._timer is None:
+                self._schedule(self.window)
+        return True
+
+    def flush(self, force=False):
+        """
+        Broadcasts the pending notifications, unless the budget is spent and force is not set.
+        """
+        with self._lock:
+            self._timer = None
+            if not self._pending:
+                return
+            text = self._compose(self._pending)
+            frames = len(pack_message(text))
+            now = time.monotonic()
+            self._refill(now)
+            # A broadcast bigger than the whole budget waits for a full budget, then goes into debt
+            needed = min(frames, self.budget_frames)
+            if self._tokens < needed and not force:
+                delay = (needed - self._tokens) * self.budget_period / self.budget_frames
+                self._schedule(delay)
+                metrics.increment('urgent.deferred')
+                logging.info(f"Urgent broadcast budget spent, holding {len(self._pending)} notification(s) for {delay:.0f}s")
+                return
+            self._tokens -= frames
+            items = len(self._pending)
+            self._pending = []
+            interface = self._interface
+
+        self.send(text, BROADCAST_NUM, interface)
+        metrics.increment('urgent.broadcasts')
+        metrics.increment('urgent.items', items)
+        logging.info(f"Broadcast {items} urgent notification(s) in {frames} frame(s)")
+
+    def stop(self):
+        """
+        Cancels the pending timer and broadcasts whatever is still waiting.
+        """
+        with self._lock:
+            if self._timer is not None:
+                self._timer.cancel()
+                self._timer = None
+        self.flush(force=True)
+
+    def _compose(self, items):
+        if len(items) == 1:
+            return items[0][0]
+        lines = [f"💥{len(items)} NEW URGENT ITEMS💥"]
+        lines += [summary for message, summary, hint in items[:self.max_items]]
+        if len(items) > self.max_items:
+            lines.append(f"+{len(items) - self.max_items} more")
+        lines += list(dict.fromkeys(hint for message, summary, hint in items))
+        return "\n".join(lines)
+
+    def _schedule(self, delay):
+        self._timer = threading.Timer(delay, self.flush)
+        self._timer.daemon = True
+        self._timer.start()
+
+    def _refill(self, now):
+        elapsed = now - self._refilled
+        self._refilled = now
+        self._tokens = min(self.budget_frames, self._tokens + elapsed * self.budget_frames / self.budget_period)
+
+    def _forget(self, now):
+        # Oldest first, so stop at the first unique_id still remembered; leaves room for the one being added
+        while self._seen:
+            unique_id, seen_at = next(iter(self._seen.items()))
+            if now - seen_at < self.dedup_ttl and len(self._seen) < self.dedup_max:
+                break
+            del self._seen[unique_id]
@@ -1,82 +1,143 @@
-import configparser
 import logging
-import random
-import time
 
 from meshtastic import BROADCAST_NUM
 
+from config_init import config_manager
 from db_operations import (
-    add_bulletin, add_mail, delete_mail,
-    get_bulletin_content, get_bulletins,
-    get_mail, get_mail_content,
+    PAGE_SIZE, add_bulletin, add_mail, delete_mail,
+    count_bulletins, get_bulletin_content, get_bulletin_page,
+    count_mail, count_unread_mail, get_mail_content, get_mail_page, mark_mail_read,
     add_channel, get_channels, get_sender_id_by_mail_id
 )
+from fortune_service import FortuneService
+from mesh_stats import get_mesh_stats
+from message_packer import pack_message
+from paging import PAGE_COMMANDS, page_cursor, page_footer, page_state
 from utils import (
     get_node_id_from_num, get_node_info,
-    get_node_short_name, send_message,
+    get_node_short_name, send_frames, send_message,
     update_user_state
 )
 
 # NEW IMPORT: Import the BlackJack module to call its functions
 import plugins.games.blackjack as bj
 
-# Read the configuration for menu options
-config = configparser.ConfigParser()
-# Ensure config.ini exists in the same directory or provide the full path.
-config.read('config.ini')
-
-# Load menu options from config.ini
-main_menu_items = config['menu']['main_menu_items'].split(',')
-bbs_menu_items = config['menu']['bbs_menu_items'].split(',')
-utilities_menu_items = config['menu']['utilities_menu_items'].split(',')
-# NEW: Loading options for the Games menu
-games_menu_items = config['menu']['games_menu_items'].split(',')
-
-
-def build_menu(items, menu_name):
+# Labels of the menu items that can be listed in the [menu] section of config.ini
+MENU_LABELS = {
+    'Q': "[Q]uick Commands",
+    'B': "[B]BS",
+    'U': "[U]tilities",
+    'G': "[G]ames 🎲",
+    'X': "E[X]IT",
+    'M': "[M]ail",
+    'C': "[C]hannel Dir",
+    'J': "[J]S8CALL",
+    'S': "[S]tats",
+    'F': "[F]ortune",
+    'W': "[W]all of Shame",
+}
+
+# Menus where a letter means something else than in MENU_LABELS
+MENU_LABEL_OVERRIDES = {
+    'bbs': {'B': "[B]ulletins"},
+    'games': {'B': "[B]lackjack 🃏"},
+}
+
+# Menu name -> (title, config key listing its items). {unread} is filled in at send time.
+MENUS = {
+    'main': ("▓▒░The Off-Grid BBS!░▒▓ (✉️:{unread})", 'main_menu_items'),
+    'bbs': ("📰BBS Menu📰", 'bbs_menu_items'),
+    'utilities': ("🛠️Utilities Menu🛠️", 'utilities_menu_items'),
+    'games': ("🎲Games Menu🎲", 'games_menu_items'),
+}
+
+
+def build_menu(items, menu_name, labels=MENU_LABELS):
     """
     Constructs the string representation of a menu to display to the user.
 
     Args:
         items (list): List of menu item identifiers (e.g., 'Q', 'B', 'U', 'X').
         menu_name (str): The title of the menu (e.g., "💾TC² BBS💾").
+        labels (dict): Item identifier -> label; unknown identifiers are skipped.
 
     Returns:
         str: The formatted menu string.
     """
-    menu_str = f"{menu_name}\n"
-    for item in items:
-        stripped_item = item.strip()  # Remove whitespace
-        if stripped_item == 'Q':
-            menu_str += "[Q]uick Commands\n"
-        elif stripped_item == 'B':
-            if menu_name == "📰BBS Menu📰":
-                menu_str += "[B]ulletins\n"
-            # NEW: Specific display for Blackjack in the Games menu
-            elif menu_name == "🎲Games Menu🎲":
-                menu_str += "[B]lackjack 🃏\n"
-            else:
-                menu_str += "[B]BS\n"
-        elif stripped_item == 'U':
-            menu_str += "[U]tilities\n"
-        # NEW: Added entry for the Games menu
-        elif stripped_item == 'G':
-            menu_str += "[G]ames 🎲\n"
-        elif stripped_item == 'X':
-            menu_str += "E[X]IT\n"
-        elif stripped_item == 'M':
-            menu_str += "[M]ail\n"
-        elif stripped_item == 'C':
-            menu_str += "[C]hannel Dir\n"
-        elif stripped_item == 'J':
-            menu_str += "[J]S8CALL\n"
-        elif stripped_item == 'S':
-            menu_str += "[S]tats\n"
-        elif stripped_item == 'F':
-            menu_str += "[F]ortune\n"
-        elif stripped_item == 'W':
-            menu_str += "[W]all of Shame\n"
-    return menu_str
+    lines = [menu_name] + [labels[item.strip()] for item in items if item.strip() in labels]
+    return "\n".join(lines) + "\n"
+
+
+class CompiledMenu:
+    """
+    A menu rendered once into radio frames.
+
+    Static menus are sent as stored. A menu with an {unread} field is split
+    around it, and if it fits one frame even with a five digit count, sending
+    it is a single string concatenation with no re-packing.
+    """
+
+    PLACEHOLDER = "{unread}"
+
+    def __init__(self, text):
+        self._frames = None
+        self._prefix, found, self._suffix = text.rstrip("\n").partition(self.PLACEHOLDER)
+        if not found:
+            self._frames = pack_message(text)
+            self.single_frame = len(self._frames) == 1
+        else:
+            self.single_frame = len(pack_message(f"{self._prefix}99999{self._suffix}")) == 1
+
+    def frames(self, unread=0):
+        if self._frames is not None:
+            return self._frames
+        text = f"{self._prefix}{unread}{self._suffix}"
+        return [text] if self.single_frame else pack_message(text)
+
+
+def compile_menus(menu_config):
+    """
+    Renders every menu from the [menu] section of the configuration.
+
+    Args:
+        menu_config (configparser.SectionProxy): The [menu] section.
+
+    Returns:
+        dict: Menu name -> CompiledMenu.
+    """
+    menus = {}
+    for name, (title, items_key) in MENUS.items():
+        labels = {**MENU_LABELS, **MENU_LABEL_OVERRIDES.get(name, {})}
+        items = menu_config.get(items_key, '').split(',')
+        menus[name] = CompiledMenu(build_menu(items, title, labels))
+        if not menus[name].single_frame:
+            logging.warning(f"The {name} menu does not fit in a single radio frame")
+    return menus
+
+
+# Compiled when the configuration is loaded, and again on every reload
+compiled_menus = {}
+
+
+def _recompile_menus(snapshot):
+    global compiled_menus
+    compiled_menus = compile_menus(snapshot['config']['menu'])
+
+
+config_manager.subscribe(_recompile_menus)
+
+# Fortune packs are indexed when the configuration is loaded and only re-read when a file changes
+fortunes = None
+
+
+def _reload_fortunes(snapshot):
+    global fortunes
+    paths = FortuneService.configured_paths(snapshot)
+    if fortunes is None or paths != fortunes.paths:
+        fortunes = FortuneService(paths)
+
+
+config_manager.subscribe(_reload_fortunes)
 
 def handle_help_command(sender_id, interface, menu_name=None):
     """
@@ -91,20 +152,14 @@ def handle_help_command(sender_id, interface, menu_name=None):
     if menu_name:
         # Update user state to indicate the current menu
         update_user_state(sender_id, {'command': 'MENU', 'menu': menu_name, 'step': 1})
-        if menu_name == 'bbs':
-            response = build_menu(bbs_menu_items, "📰BBS Menu📰")
-        elif menu_name == 'utilities':
-            response = build_menu(utilities_menu_items, "🛠️Utilities Menu🛠️")
-        # NEW: Handles the display of the Games menu
-        elif menu_name == 'games':
-            response = build_menu(games_menu_items, "🎲Games Menu🎲")
+        frames = compiled_menus[menu_name].frames()
     else:
         # Reset to main menu state
         update_user_state(sender_id, {'command': 'MAIN_MENU', 'step': 1})
-        mail = get_mail(get_node_id_from_num(sender_id, interface))
+        unread = count_unread_mail(get_node_id_from_num(sender_id, interface))
         # Display main menu with unread message count
-        response = build_menu(main_menu_items, f"▓▒░The Off-Grid BBS!░▒▓ (✉️:{len(mail)})")
-    send_message(response, sender_id, interface)
+        frames = compiled_menus['main'].frames(unread)
+    send_frames(frames, sender_id, interface)
 
 def get_node_name(node_id, interface):
     """
@@ -168,7 +223,7 @@ def handle_stats_command(sender_id, interface):
     """
     Displays the Stats menu.
     """
-    response = "📊Stats Menu📊\nWhat stats would you like to view?\n[N]odes  [H]ardware  [R]oles  E[X]IT"
+    response = "📊Stats Menu📊\nWhat stats would you like to view?\n[N]odes  [H]ardware  [R]oles  [A]ctivity  E[X]IT"
     send_message(response, sender_id, interface)
     update_user_state(sender_id, {'command': 'STATS', 'step': 1})
 
@@ -178,16 +233,12 @@ def handle_fortune_command(sender_id, interface):
     Displays a random fortune from a file.
     """
     try:
-        with open('fortunes.txt', 'r', encoding='utf-8') as file: # Added encoding
-            fortunes = file.readlines()
-        if not fortunes:
+        fortune = fortunes.random() if fortunes is not None else None
+        if fortune is None:
             send_message("No fortunes available.", sender_id, interface)
             return
-        fortune = random.choice(fortunes).strip()
         decorated_fortune = f"🔮 {fortune} 🔮"
         send_message(decorated_fortune, sender_id, interface)
-    except FileNotFoundError: # Handles the case where the file does not exist
-        send_message("Error: 'fortunes.txt' file not found.", sender_id, interface)
     except Exception as e:
         send_message(f"Error generating fortune: {e}", sender_id, interface)
 
@@ -206,42 +257,77 @@ def handle_stats_steps(sender_id, message, step, interface):
             handle_help_command(sender_id, interface)
             return
         elif choice == 'n':
-            current_time = int(time.time())
-            timeframes = {
-                "All time": None,
-                "Last 24 hours": 86400,
-                "Last 8 hours": 28800,
-                "Last hour": 3600
-            }
-            total_nodes_summary = []
-
-            for period, seconds in timeframes.items():
-                if seconds is None:
-                    total_nodes = len(interface.nodes)
-                else:
-                    time_limit = current_time - seconds
-                    total_nodes = sum(1 for node in interface.nodes.values() if node.get('lastHeard') is not None and node['lastHeard'] >= time_limit)
-                total_nodes_summary.append(f"- {period}: {total_nodes}")
-
-            response = "Total nodes seen:\n" + "\n".join(total_nodes_summary)
+            summary = [f"- {period}: {count}" for period, count in get_mesh_stats(interface).node_counts()]
+            response = "Total nodes seen:\n" + "\n".join(summary)
             send_message(response, sender_id, interface)
             handle_stats_command(sender_id, interface)
         elif choice == 'h':
-            hw_models = {}
-            for node in interface.nodes.values():
-                hw_model = node['user'].get('hwModel', 'Unknown')
-                hw_models[hw_model] = hw_models.get(hw_model, 0) + 1
+            hw_models = get_mesh_stats(interface).hardware_models()
             response = "Hardware Models:\n" + "\n".join([f"{model}: {count}" for model, count in hw_models.items()])
             send_message(response, sender_id, interface)
             handle_stats_command(sender_id, interface)
         elif choice == 'r':
-            roles = {}
-            for node in interface.nodes.values():
-                role = node['user'].get('role', 'Unknown')
-                roles[role] = roles.get(role, 0) + 1
+            roles = get_mesh_stats(interface).roles()
             response = "Roles:\n" + "\n".join([f"{role}: {count}" for role, count in roles.items()])
             send_message(response, sender_id, interface)
             handle_stats_command(sender_id, interface)
+        elif choice == 'a':
+            send_message(format_activity(get_mesh_stats(interface).hourly_history()), sender_id, interface)
+            handle_stats_command(sender_id, interface)
+
+
+SPARK_LEVELS = "▁▂▃▄▅▆▇█"
+
+
+def format_activity(hourly):
+    """
+    Formats nodes heard per hour (oldest first) as a 24 hour sparkline and daily peaks for the week.
+    """
+    day = hourly[-24:]
+    peak = max(day) or 1
+    spark = "".join(SPARK_LEVELS[count * (len(SPARK_LEVELS) - 1) // peak] for count in day)
+    daily = [max(hourly[i:i + 24]) for i in range(len(hourly) % 24, len(hourly), 24)]
+    return (f"Nodes heard per hour, last 24h (peak {max(day)}):\n{spark}\n"
+            f"Daily peak, last {len(daily)} days:\n" + " ".join(str(count) for count in daily))
+
+
+def send_board_page(sender_id, board_name, interface, before_id=None, after_id=None):
+    """
+    Sends one page of a board's bulletin list in a single message.
+
+    Returns:
+        bool: False if the page is empty.
+    """
+    bulletins, has_older, has_newer = get_bulletin_page(board_name, before_id, after_id)
+    if not bulletins:
+        return False
+    response = f"Select a bulletin number to view from {board_name}:\n"
+    response += "\n".join(f"[{bulletin[0]}] {bulletin[1]}" for bulletin in bulletins)
+    response += page_footer(has_older, has_newer)
+    send_message(response, sender_id, interface)
+    update_user_state(sender_id, {'command': 'BULLETIN_READ', 'step': 3, 'board': board_name,
+                                  **page_state(bulletins, has_older, has_newer)})
+    return True
+
+
+def send_mailbox_page(sender_id, interface, before_id=None, after_id=None):
+    """
+    Sends one page of the sender's mailbox in a single message.
+
+    Returns:
+        bool: False if the page is empty.
+    """
+    sender_node_id = get_node_id_from_num(sender_id, interface)
+    mail, has_older, has_newer = get_mail_page(sender_node_id, before_id, after_id)
+    if not mail:
+        return False
+    response = (f"You have {count_mail(sender_node_id)} mail messages ({count_unread_mail(sender_node_id)} unread). "
+                f"Select a message number to read:\n")
+    response += "\n".join(f"-{msg[0]}- {msg[3]} From: {msg[1]}\nSubject: {msg[2]}" for msg in mail)
+    response += page_footer(has_older, has_newer)
+    send_message(response, sender_id, interface)
+    update_user_state(sender_id, {'command': 'MAIL', 'step': 2, **page_state(mail, has_older, has_newer)})
+    return True
 
 
 def handle_bb_steps(sender_id, message, step, state, interface, bbs_nodes):
@@ -254,21 +340,14 @@ def handle_bb_steps(sender_id, message, step, state, interface, bbs_nodes):
             handle_help_command(sender_id, interface, 'bbs')
             return
         board_name = boards[int(message)]
-        bulletins = get_bulletins(board_name)
-        response = f"{board_name} has {len(bulletins)} messages.\n[R]ead  [P]ost"
+        response = f"{board_name} has {count_bulletins(board_name)} messages.\n[R]ead  [P]ost"
         send_message(response, sender_id, interface)
         update_user_state(sender_id, {'command': 'BULLETIN_ACTION', 'step': 2, 'board': board_name})
 
     elif step == 2:
         board_name = state['board']
         if message.lower() == 'r':
-            bulletins = get_bulletins(board_name)
-            if bulletins:
-                send_message(f"Select a bulletin number to view from {board_name}:", sender_id, interface)
-                for bulletin in bulletins:
-                    send_message(f"[{bulletin[0]}] {bulletin[1]}", sender_id, interface)
-                update_user_state(sender_id, {'command': 'BULLETIN_READ', 'step': 3, 'board': board_name})
-            else:
+            if not send_board_page(sender_id, board_name, interface):
                 send_message(f"No bulletins in {board_name}.", sender_id, interface)
                 handle_bb_steps(sender_id, 'e', 1, state, interface, bbs_nodes)
         elif message.lower() == 'p':
@@ -284,6 +363,12 @@ def handle_bb_steps(sender_id, message, step, state, interface, bbs_nodes):
             update_user_state(sender_id, {'command': 'BULLETIN_POST', 'step': 4, 'board': board_name})
 
     elif step == 3:
+        choice = message.lower().strip()
+        if choice in PAGE_COMMANDS:
+            cursor = page_cursor(choice, state)
+            if cursor is None or not send_board_page(sender_id, state['board'], interface, *cursor):
+                send_message("No more bulletins that way.", sender_id, interface)
+            return
         bulletin_id = int(message)
         sender_short_name, date, subject, content, unique_id = get_bulletin_content(bulletin_id)
         send_message(f"From: {sender_short_name}\nDate: {date}\nSubject: {subject}\n- - - - - - -\n{content}", sender_id, interface)
@@ -326,14 +411,7 @@ def handle_mail_steps(sender_id, message, step, state, interface, bbs_nodes):
     if step == 1:
         choice = message.lower()
         if choice == 'r':
-            sender_node_id = get_node_id_from_num(sender_id, interface)
-            mail = get_mail(sender_node_id)
-            if mail:
-                send_message(f"You have {len(mail)} mail messages. Select a message number to read:", sender_id, interface)
-                for msg in mail:
-                    send_message(f"-{msg[0]}-\nDate: {msg[3]}\nFrom: {msg[1]}\nSubject: {msg[2]}", sender_id, interface)
-                update_user_state(sender_id, {'command': 'MAIL', 'step': 2})
-            else:
+            if not send_mailbox_page(sender_id, interface):
                 send_message("There are no messages in your mailbox.📭", sender_id, interface)
                 update_user_state(sender_id, None)
         elif choice == 's':
@@ -343,10 +421,16 @@ def handle_mail_steps(sender_id, message, step, state, interface, bbs_nodes):
             handle_help_command(sender_id, interface)
 
     elif step == 2:
+        if message.lower() in PAGE_COMMANDS:
+            cursor = page_cursor(message.lower(), state)
+            if cursor is None or not send_mailbox_page(sender_id, interface, *cursor):
+                send_message("No more messages that way.", sender_id, interface)
+            return
         mail_id = int(message)
         try:
             sender_node_id = get_node_id_from_num(sender_id, interface)
             sender, date, subject, content, unique_id = get_mail_content(mail_id, sender_node_id)
+            mark_mail_read(mail_id)
             send_message(f"Date: {date}\nFrom: {sender}\nSubject: {subject}\n{content}", sender_id, interface)
             send_message("What would you like to do with this message?\n[K]eep  [D]elete  [R]eply", sender_id, interface)
             update_user_state(sender_id, {'command': 'CHECK_MAIL', 'step': 2, 'mail_id': mail_id, 'unique_id': unique_id, 'sender': sender, 'subject': subject, 'content': content})
@@ -541,24 +625,36 @@ def handle_send_mail_command(sender_id, message, interface, bbs_nodes):
         send_message("Error processing send mail command.", sender_id, interface)
 
 
+def send_check_mail_page(sender_id, interface, before_id=None, after_id=None, offset=0):
+    """
+    Sends one page of the quick check mail listing, numbered from offset + 1.
+
+    Returns:
+        bool: False if the page is empty.
+    """
+    sender_node_id = get_node_id_from_num(sender_id, interface)
+    mail, has_older, has_newer = get_mail_page(sender_node_id, before_id, after_id)
+    if not mail:
+        return False
+    response = "📬 You have the following messages:\n"
+    for i, msg in enumerate(mail):
+        response += f"{offset + i + 1:02d}. From: {msg[1]}, Subject: {msg[2]}\n"
+    response += "\nPlease reply with the number of the message you want to read."
+    response += page_footer(has_older, has_newer)
+    send_message(response, sender_id, interface)
+
+    update_user_state(sender_id, {'command': 'CHECK_MAIL', 'step': 1, 'mail': mail, 'offset': offset,
+                                  **page_state(mail, has_older, has_newer)})
+    return True
+
+
 def handle_check_mail_command(sender_id, interface):
     """
     Handles the quick check mail command (CM).
     """
     try:
-        sender_node_id = get_node_id_from_num(sender_id, interface)
-        mail = get_mail(sender_node_id)
-        if not mail:
+        if not send_check_mail_page(sender_id, interface):
             send_message("You have no new messages.", sender_id, interface)
-            return
-
-        response = "📬 You have the following messages:\n"
-        for i, msg in enumerate(mail):
-            response += f"{i + 1:02d}. From: {msg[1]}, Subject: {msg[2]}\n"
-        response += "\nPlease reply with the number of the message you want to read."
-        send_message(response, sender_id, interface)
-
-        update_user_state(sender_id, {'command': 'CHECK_MAIL', 'step': 1, 'mail': mail})
 
     except Exception as e:
         logging.error(f"Error processing check mail command: {e}")
@@ -571,7 +667,16 @@ def handle_read_mail_command(sender_id, message, state, interface):
     """
     try:
         mail = state.get('mail', [])
-        message_number = int(message) - 1
+        offset = state.get('offset', 0)
+        choice = message.lower().strip()
+        if choice in PAGE_COMMANDS:
+            cursor = page_cursor(choice, state)
+            offset = offset + len(mail) if choice == 'n' else max(offset - PAGE_SIZE, 0)
+            if cursor is None or not send_check_mail_page(sender_id, interface, *cursor, offset=offset):
+                send_message("No more messages that way.", sender_id, interface)
+            return
+
+        message_number = int(message) - 1 - offset
 
         if message_number < 0 or message_number >= len(mail):
             send_message("Invalid message number. Please try again.", sender_id, interface)
@@ -580,6 +685,7 @@ def handle_read_mail_command(sender_id, message, state, interface):
         mail_id = mail[message_number][0]
         sender_node_id = get_node_id_from_num(sender_id, interface)
         sender, date, subject, content, unique_id = get_mail_content(mail_id, sender_node_id)
+        mark_mail_read(mail_id)
         response = f"Date: {date}\nFrom: {sender}\nSubject: {subject}\n\n{content}"
         send_message(response, sender_id, interface)
         send_message("What would you like to do with this message?\n[K]eep  [D]elete  [R]eply", sender_id, interface)
@@ -641,6 +747,29 @@ def handle_post_bulletin_command(sender_id, message, interface, bbs_nodes):
         send_message("Error processing post bulletin command.", sender_id, interface)
 
 
+def send_check_bulletin_page(sender_id, board_name, interface, before_id=None, after_id=None, offset=0):
+    """
+    Sends one page of the quick check bulletin listing, numbered from offset + 1.
+
+    Returns:
+        bool: False if the page is empty.
+    """
+    bulletins, has_older, has_newer = get_bulletin_page(board_name, before_id, after_id)
+    if not bulletins:
+        return False
+    response = f"📰 Bulletins on {board_name} board:\n"
+    for i, bulletin in enumerate(bulletins):
+        response += f"[{offset + i + 1:02d}] Subject: {bulletin[1]}, From: {bulletin[2]}, Date: {bulletin[3]}\n"
+    response += "\nPlease reply with the number of the bulletin you want to read."
+    response += page_footer(has_older, has_newer)
+    send_message(response, sender_id, interface)
+
+    update_user_state(sender_id, {'command': 'CHECK_BULLETIN', 'step': 1, 'board_name': board_name,
+                                  'bulletins': bulletins, 'offset': offset,
+                                  **page_state(bulletins, has_older, has_newer)})
+    return True
+
+
 def handle_check_bulletin_command(sender_id, message, interface):
     """
     Handles the quick check bulletin command (CB,,).
@@ -661,18 +790,8 @@ def handle_check_bulletin_command(sender_id, message, interface):
             return
         board_name = boards[found_board_key] # Use the canonical board name
 
-        bulletins = get_bulletins(board_name)
-        if not bulletins:
+        if not send_check_bulletin_page(sender_id, board_name, interface):
             send_message(f"No bulletins available on {board_name} board.", sender_id, interface)
-            return
-
-        response = f"📰 Bulletins on {board_name} board:\n"
-        for i, bulletin in enumerate(bulletins):
-            response += f"[{i+1:02d}] Subject: {bulletin[1]}, From: {bulletin[2]}, Date: {bulletin[3]}\n"
-        response += "\nPlease reply with the number of the bulletin you want to read."
-        send_message(response, sender_id, interface)
-
-        update_user_state(sender_id, {'command': 'CHECK_BULLETIN', 'step': 1, 'board_name': board_name, 'bulletins': bulletins})
 
     except Exception as e:
         logging.error(f"Error processing check bulletin command: {e}")
@@ -684,7 +803,17 @@ def handle_read_bulletin_command(sender_id, message, state, interface):
     """
     try:
         bulletins = state.get('bulletins', [])
-        message_number = int(message) - 1
+        offset = state.get('offset', 0)
+        choice = message.lower().strip()
+        if choice in PAGE_COMMANDS:
+            cursor = page_cursor(choice, state)
+            offset = offset + len(bulletins) if choice == 'n' else max(offset - PAGE_SIZE, 0)
+            if cursor is None or not send_check_bulletin_page(sender_id, state['board_name'], interface,
+                                                              *cursor, offset=offset):
+                send_message("No more bulletins that way.", sender_id, interface)
+            return
+
+        message_number = int(message) - 1 - offset
 
         if message_number < 0 or message_number >= len(bulletins):
             send_message("Invalid bulletin number. Please try again.", sender_id, interface)
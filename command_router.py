@@ -0,0 +1,153 @@
+import logging
+
+
+# Trie nodes are dicts keyed by character; a command's handler is stored under
+# the empty string, which can never be a character key.
+_HANDLER = ''
+
+
+class PrefixTrie:
+    """
+    Maps command prefixes to values; lookups cost the length of the matched
+    prefix, not the number of registered prefixes.
+    """
+
+    def __init__(self):
+        self._root = {}
+
+    def insert(self, prefix, value):
+        if not prefix:
+            raise ValueError("Command prefix must not be empty")
+        node = self._root
+        for char in prefix:
+            node = node.setdefault(char, {})
+        node[_HANDLER] = value
+
+    def match(self, text):
+        """
+        Returns the value of the longest registered prefix of text, or None.
+        """
+        node = self._root
+        found = None
+        for char in text:
+            node = node.get(char)
+            if node is None:
+                break
+            found = node.get(_HANDLER, found)
+        return found
+
+
+class CommandRouter:
+    """
+    Finds the handler for a user message from compiled lookup tables.
+
+    A message is offered, in order, to:
+
+    1. interceptors registered for the user's current state command,
+    2. quick commands (prefix trie on the lowercased message),
+    3. state handlers, which receive every message while the user is in that state,
+    4. the menu keys of the user's current menu ('x' always returns to the main menu),
+    5. the (command, step) table of multi-message conversations,
+    6. the fallback handler.
+
+    Plugins extend the BBS by calling the register_* methods on the shared
+    router in message_processing.
+
+    Interceptor, quick command, state and step handlers are called as
+    handler(sender_id, message, state, interface, bbs_nodes). Menu key handlers
+    keep the menu signature handler(sender_id, interface), plus state when the
+    menu was registered with pass_state=True.
+    """
+
+    def __init__(self, fallback):
+        self.fallback = fallback
+        self._quick_commands = PrefixTrie()
+        self._interceptors = {}
+        self._state_handlers = {}
+        self._menus = {}
+        self._steps = {}
+
+    def register_interceptor(self, command, handler):
+        """
+        Runs handler before anything else while the user's state command is `command`.
+        The handler returns True when it consumed the message.
+        """
+        self._interceptors.setdefault(command, []).append(handler)
+
+    def register_quick_command(self, prefix, handler):
+        self._quick_commands.insert(prefix.lower(), handler)
+
+    def register_state(self, command, handler):
+        self._state_handlers[command] = handler
+
+    def register_menu(self, handlers, command=None, menu=None, pass_state=False):
+        """
+        Registers the key handlers shown while the user's state is (command, menu).
+        command=None registers the main menu, used whenever no other menu matches.
+        """
+        self._menus[(command, menu)] = (handlers, pass_state)
+
+    def register_step(self, command, handler, step=None):
+        """
+        Registers a conversation step handler. step=None handles every step of `command`
+        that has no handler of its own.
+        """
+        self._steps[(command, step)] = handler
+
+    def _menu_for(self, state):
+        if state:
+            command = state['command']
+            menu = self._menus.get((command, state.get('menu'))) or self._menus.get((command, None))
+            if menu:
+                return menu
+        return self._menus[(None, None)]
+
+    def dispatch(self, sender_id, message, message_lower, state, interface, bbs_nodes):
+        """
+        Routes one user message to its handler.
+
+        Args:
+            sender_id (int): The numeric ID of the sending node.
+            message (str): The message as received.
+            message_lower (str): The lowercased, stripped message used for command matching.
+            state (dict): The user's conversation state, or None.
+            interface (meshtastic.stream_interface.StreamInterface): The Meshtastic interface object.
+            bbs_nodes (list): Peer BBS node IDs, passed on to handlers that sync.
+        """
+        command = state['command'] if state else None
+
+        for interceptor in self._interceptors.get(command, ()):
+            if interceptor(sender_id, message, state, interface, bbs_nodes):
+                return
+
+        handler = self._quick_commands.match(message_lower)
+        if handler:
+            handler(sender_id, message, state, interface, bbs_nodes)
+            return
+
+        handler = self._state_handlers.get(command)
+        if handler:
+            handler(sender_id, message, state, interface, bbs_nodes)
+            return
+
+        if message_lower == 'x':
+            self.fallback(sender_id, interface)
+            return
+
+        handlers, pass_state = self._menu_for(state)
+        key_handler = handlers.get(message_lower)
+        if key_handler:
+            if pass_state:
+                key_handler(sender_id, interface, state)
+            else:
+                key_handler(sender_id, interface)
+            return
+
+        if state:
+            handler = self._steps.get((command, state['step'])) or self._steps.get((command, None))
+            if handler:
+                handler(sender_id, message, state, interface, bbs_nodes)
+                return
+            logging.debug(f"No handler for {command} step {state['step']}")
+
+        self.fallback(sender_id, interface)
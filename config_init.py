@@ -1,6 +1,11 @@
 import configparser
+import logging
+import os
+import signal
+import threading
 import time
-from typing import Any
+from types import MappingProxyType
+from typing import Any, Callable
 import meshtastic.stream_interface
 import meshtastic.serial_interface
 import meshtastic.tcp_interface
@@ -91,6 +96,8 @@ def initialize_config(config_file: str = None) -> dict[str, Any]:
     hostname - host name for TCP interface
     port - serial port name for serial interface
     bbs_nodes - list of peer nodes to sync with
+    sync_format - 'legacy' or 'compact' frames for outgoing sync messages
+    sync_reconcile_interval - seconds between catch-up sync rounds with peers
 
     Args:
         config_file (str, optional): Path to config file. Function reads from './config.ini' if this arg is set to None. Defaults to None.
@@ -112,13 +119,19 @@ def initialize_config(config_file: str = None) -> dict[str, Any]:
     if bbs_nodes == ['']:
         bbs_nodes = []
 
-    print(f"Configured to sync with the following BBS nodes: {bbs_nodes}")
+    logging.info(f"Configured to sync with the following BBS nodes: {bbs_nodes}")
+
+    sync_format = config.get('sync', 'format', fallback='legacy').strip().lower()
+    sync_reconcile_interval = config.getint('sync', 'reconcile_interval', fallback=21600)
+    if sync_format not in ('legacy', 'compact'):
+        logging.warning(f"Unknown sync format '{sync_format}', falling back to legacy")
+        sync_format = 'legacy'
 
     allowed_nodes = config.get('allow_list', 'allowed_nodes', fallback='').split(',')
     if allowed_nodes == ['']:
         allowed_nodes = []
 
-    print(f"Nodes with Urgent board permissions: {allowed_nodes}")
+    logging.info(f"Nodes with Urgent board permissions: {allowed_nodes}")
 
     return {
         'config': config,
@@ -126,12 +139,136 @@ def initialize_config(config_file: str = None) -> dict[str, Any]:
         'hostname': hostname,
         'port': port,
         'bbs_nodes': bbs_nodes,
+        'sync_format': sync_format,
+        'sync_reconcile_interval': sync_reconcile_interval,
         'allowed_nodes': allowed_nodes,
         'mqtt_topic': 'meshtastic.receive'
     }
 
 
 
+# Settings that only take effect when the radio interface is opened
+RESTART_REQUIRED_KEYS = ('interface_type', 'hostname', 'port', 'mqtt_topic')
+
+
+class ConfigManager:
+    """
+    Holds the current configuration snapshot and reloads it when config.ini changes.
+
+    A snapshot is the dict returned by initialize_config(), with the CLI
+    overrides merged in, frozen into a read-only mapping with tuples in place
+    of lists. Readers take `current` once per use and never see a partially
+    applied reload: a new snapshot is built completely, then swapped in, and
+    then every subscriber is called with it to rebuild whatever it derives
+    from the configuration. A config file that fails to parse leaves the
+    previous snapshot in place.
+    """
+
+    def __init__(self):
+        self._snapshot = None
+        self._config_file = "config.ini"
+        self._args = None
+        self._mtime = None
+        self._subscribers = []
+        self._lock = threading.RLock()
+        self._reload_requested = threading.Event()
+        self._watcher = None
+
+    @property
+    def current(self) -> MappingProxyType:
+        """The current snapshot.
+
+        Raises:
+            RuntimeError: load() has not been called yet.
+        """
+        with self._lock:
+            if self._snapshot is None:
+                raise RuntimeError("Configuration read before config_manager.load()")
+            return self._snapshot
+
+    def load(self, config_file: str = None, args: argparse.Namespace = None) -> MappingProxyType:
+        """Loads config_file (./config.ini if None) and applies the CLI overrides in args to it and every reload.
+
+        Returns:
+            MappingProxyType: the new snapshot
+        """
+        with self._lock:
+            self._config_file = config_file or "config.ini"
+            self._args = args
+            self._snapshot = None
+        return self.reload()
+
+    def subscribe(self, callback: Callable[[MappingProxyType], None]) -> None:
+        """Registers callback(snapshot), called after every reload."""
+        with self._lock:
+            self._subscribers.append(callback)
+
+    def reload(self) -> MappingProxyType:
+        """Re-reads the config file and notifies subscribers. Keeps the old snapshot if the file is invalid."""
+        with self._lock:
+            previous = self._snapshot
+            try:
+                snapshot = self._read()
+            except (configparser.Error, KeyError, ValueError, OSError) as e:
+                if previous is None:
+                    raise
+                logging.error(f"Config reload failed, keeping the previous configuration: {e}")
+                return previous
+
+            if previous is not None:
+                for key in RESTART_REQUIRED_KEYS:
+                    if previous[key] != snapshot[key]:
+                        logging.warning(f"Config change of '{key}' takes effect after a restart")
+            self._snapshot = snapshot
+            subscribers = list(self._subscribers)
+
+        for callback in subscribers:
+            try:
+                callback(snapshot)
+            except Exception as e:
+                logging.error(f"Error applying reloaded config in {getattr(callback, '__name__', callback)}: {e}")
+        if previous is not None:
+            logging.info(f"Configuration reloaded from {self._config_file}")
+        return snapshot
+
+    def watch(self, interval: float = 5.0) -> None:
+        """Reloads on SIGHUP and when the config file's mtime changes, checking every interval seconds.
+
+        Must be called from the main thread for the SIGHUP handler to be installed.
+        """
+        if hasattr(signal, 'SIGHUP') and threading.current_thread() is threading.main_thread():
+            signal.signal(signal.SIGHUP, lambda signum, frame: self._reload_requested.set())
+        if self._watcher is None:
+            self._watcher = threading.Thread(target=self._watch, args=(interval,), name='config-watcher', daemon=True)
+            self._watcher.start()
+
+    def _watch(self, interval):
+        while True:
+            requested = self._reload_requested.wait(interval)
+            self._reload_requested.clear()
+            if requested or self._file_mtime() != self._mtime:
+                self.reload()
+
+    def _file_mtime(self):
+        try:
+            return os.stat(self._config_file).st_mtime_ns
+        except OSError:
+            return None
+
+    def _read(self):
+        self._mtime = self._file_mtime()
+        if self._mtime is None:
+            raise OSError(f"Config file {self._config_file} not found")
+        system_config = initialize_config(self._config_file)
+        if self._args is not None:
+            merge_config(system_config, self._args)
+        return MappingProxyType({key: tuple(value) if isinstance(value, list) else value
+                                 for key, value in system_config.items()})
+
+
+config_manager = ConfigManager()
+
+
 def get_interface(system_config:dict[str, Any]) -> meshtastic.stream_interface.StreamInterface:
     """
     Function opens and returns an instance meshtastic interface of type specified by the configuration
@@ -0,0 +1,154 @@
+import logging
+import sqlite3
+import threading
+from contextlib import contextmanager
+
+BUSY_TIMEOUT_MS = 5000
+CACHED_STATEMENTS = 256
+
+
+def open_connection(db_file, readonly=False, check_same_thread=True):
+    """
+    Opens a SQLite connection tuned for a database shared by several processes.
+
+    The database is switched to WAL so readers never wait on the writer,
+    fsyncs are reduced with synchronous=NORMAL, and lock contention with
+    another process (e.g. db_admin.py) waits up to BUSY_TIMEOUT_MS instead of
+    failing immediately.
+    """
+    conn = sqlite3.connect(db_file, timeout=BUSY_TIMEOUT_MS / 1000,
+                           check_same_thread=check_same_thread,
+                           cached_statements=CACHED_STATEMENTS)
+    conn.execute(f"PRAGMA busy_timeout = {BUSY_TIMEOUT_MS}")
+    if not readonly:
+        conn.execute("PRAGMA journal_mode = WAL")
+    conn.execute("PRAGMA synchronous = NORMAL")
+    if readonly:
+        conn.execute("PRAGMA query_only = ON")
+    return conn
+
+
+def keyset_page(conn, table, columns, where, params, before_id, after_id, limit):
+    """
+    Reads one page of rows matching `where`, ordered by id, newest first.
+
+    Paging is by key rather than OFFSET, so every page costs the same index
+    range scan however deep into the listing it is.
+
+    Args:
+        conn (sqlite3.Connection): Connection to read from.
+        table (str): Table with an integer id that grows with each insert.
+        columns (str): Columns to select; the first must be id.
+        where (str): Filter, with ? placeholders for `params`.
+        params (tuple): Values for the filter.
+        before_id (int): Return the rows older than this id (the next page).
+        after_id (int): Return the rows newer than this id (the previous page).
+            With neither, the newest page is returned.
+        limit (int): Rows per page.
+
+    Returns:
+        tuple: (rows, has_older, has_newer)
+    """
+    c = conn.cursor()
+    select = f"SELECT {columns} FROM {table} WHERE {where}"
+    if after_id is not None:
+        c.execute(f"{select} AND id > ? ORDER BY id ASC LIMIT ?", params + (after_id, limit + 1))
+        rows = c.fetchall()
+        has_newer = len(rows) > limit
+        rows = rows[:limit][::-1]
+        has_older = bool(rows) and c.execute(f"SELECT 1 FROM {table} WHERE {where} AND id < ? LIMIT 1",
+                                             params + (rows[-1][0],)).fetchone() is not None
+    else:
+        if before_id is None:
+            c.execute(f"{select} ORDER BY id DESC LIMIT ?", params + (limit + 1,))
+        else:
+            c.execute(f"{select} AND id < ? ORDER BY id DESC LIMIT ?", params + (before_id, limit + 1))
+        rows = c.fetchall()
+        has_older = len(rows) > limit
+        rows = rows[:limit]
+        has_newer = bool(rows) and c.execute(f"SELECT 1 FROM {table} WHERE {where} AND id > ? LIMIT 1",
+                                             params + (rows[0][0],)).fetchone() is not None
+    return rows, has_older, has_newer
+
+
+class ConnectionManager:
+    """
+    Hands out one read-only connection per thread and a single shared writer.
+
+    Reads (menu rendering, listings) go through reader() and, thanks to WAL,
+    never block behind a write. All writes are serialised through writer(),
+    which holds a lock for the duration of the transaction.
+
+    Readers of threads that have exited (e.g. threading.Timer callbacks) are
+    closed the next time a reader is opened, so short-lived threads do not
+    leave connections behind.
+    """
+
+    def __init__(self, db_file):
+        self.db_file = db_file
+        self._local = threading.local()
+        self._readers = []  # (thread, connection)
+        self._readers_lock = threading.Lock()
+        self._writer = None
+        self._writer_lock = threading.RLock()
+
+    def _writer_connection(self):
+        if self._writer is None:
+            # Open the writer first so the database is in WAL mode before any reader attaches
+            self._writer = open_connection(self.db_file, check_same_thread=False)
+        return self._writer
+
+    def reader(self):
+        conn = getattr(self._local, 'connection', None)
+        if conn is None:
+            with self._writer_lock:
+                self._writer_connection()
+            conn = open_connection(self.db_file, readonly=True, check_same_thread=False)
+            self._local.connection = conn
+            with self._readers_lock:
+                self._prune_readers()
+                self._readers.append((threading.current_thread(), conn))
+        return conn
+
+    def _prune_readers(self):
+        alive = []
+        for thread, conn in self._readers:
+            if thread.is_alive():
+                alive.append((thread, conn))
+            else:
+                conn.close()
+        self._readers = alive
+
+    @contextmanager
+    def writer(self):
+        """
+        Yields the writer connection with the write lock held.
+
+        The transaction is committed when the block exits, or rolled back if it raises.
+        """
+        with self._writer_lock:
+            conn = self._writer_connection()
+            try:
+                yield conn
+            except BaseException:
+                if conn.in_transaction:
+                    conn.rollback()
+                raise
+            if conn.in_transaction:
+                conn.commit()
+
+    def close(self):
+        with self._writer_lock:
+            if self._writer is not None:
+                try:
+                    # Fold the WAL back into the main file so a clean shutdown leaves one file behind
+                    self._writer.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+                except sqlite3.Error as e:
+                    logging.warning(f"WAL checkpoint on shutdown failed: {e}")
+                self._writer.close()
+                self._writer = None
+        with self._readers_lock:
+            for thread, conn in self._readers:
+                conn.close()
+            self._readers.clear()
+        self._local = threading.local()
@@ -1,61 +1,44 @@
 import logging
-import sqlite3
-import threading
 import uuid
 from datetime import datetime
 
-from meshtastic import BROADCAST_NUM
-
+from db_connection import ConnectionManager, keyset_page
+import metrics
+from db_schema import migrate
+from write_batcher import WriteBatcher
 from utils import (
     send_bulletin_to_bbs_nodes,
     send_delete_bulletin_to_bbs_nodes,
     send_delete_mail_to_bbs_nodes,
-    send_mail_to_bbs_nodes, send_message, send_channel_to_bbs_nodes
+    send_mail_to_bbs_nodes, send_channel_to_bbs_nodes,
+    urgent_broadcasts
 )
 
 
-thread_local = threading.local()
+database = ConnectionManager('bulletins.db')
+writes = WriteBatcher(database)
+
+# Rows per page of a bulletin or mail listing, so a page fits in one or two radio frames
+PAGE_SIZE = 5
 
 def get_db_connection():
-    if not hasattr(thread_local, 'connection'):
-        thread_local.connection = sqlite3.connect('bulletins.db')
-    return thread_local.connection
+    """
+    Returns this thread's read-only connection. Writes go through database.writer().
+    """
+    return database.reader()
 
 def initialize_database():
-    conn = get_db_connection()
-    c = conn.cursor()
-    c.execute('''CREATE TABLE IF NOT EXISTS bulletins (
-                    id INTEGER PRIMARY KEY AUTOINCREMENT,
-                    board TEXT NOT NULL,
-                    sender_short_name TEXT NOT NULL,
-                    date TEXT NOT NULL,
-                    subject TEXT NOT NULL,
-                    content TEXT NOT NULL,
-                    unique_id TEXT NOT NULL
-                )''')
-    c.execute('''CREATE TABLE IF NOT EXISTS mail (
-                    id INTEGER PRIMARY KEY AUTOINCREMENT,
-                    sender TEXT NOT NULL,
-                    sender_short_name TEXT NOT NULL,
-                    recipient TEXT NOT NULL,
-                    date TEXT NOT NULL,
-                    subject TEXT NOT NULL,
-                    content TEXT NOT NULL,
-                    unique_id TEXT NOT NULL
-                );''')
-    c.execute('''CREATE TABLE IF NOT EXISTS channels (
-                    id INTEGER PRIMARY KEY AUTOINCREMENT,
-                    name TEXT NOT NULL,
-                    url TEXT NOT NULL
-                );''')
-    conn.commit()
+    with database.writer() as conn:
+        migrate(conn)
     print("Database schema initialized.")
 
+def close_database():
+    writes.stop()
+    database.close()
+
 def add_channel(name, url, bbs_nodes=None, interface=None):
-    conn = get_db_connection()
-    c = conn.cursor()
-    c.execute("INSERT INTO channels (name, url) VALUES (?, ?)", (name, url))
-    conn.commit()
+    with database.writer() as conn:
+        conn.execute("INSERT INTO channels (name, url) VALUES (?, ?)", (name, url))
 
     if bbs_nodes and interface:
         send_channel_to_bbs_nodes(name, url, bbs_nodes, interface)
@@ -69,33 +52,73 @@ def get_channels():
 
 
 
-def add_bulletin(board, sender_short_name, subject, content, bbs_nodes, interface, unique_id=None):
-    conn = get_db_connection()
-    c = conn.cursor()
+def add_bulletin(board, sender_short_name, subject, content, bbs_nodes, interface, unique_id=None, wait=True):
+    """
+    Stores a bulletin through the write batcher and returns its unique_id.
+
+    Syncing to other BBS nodes and the urgent notification only happen once
+    the row has committed. With wait=False (used for sync ingestion) the
+    call returns before the commit so bursts share one transaction.
+    """
     date = datetime.now().strftime('%Y-%m-%d %H:%M')
     if not unique_id:
         unique_id = str(uuid.uuid4())
-    c.execute(
-        "INSERT INTO bulletins (board, sender_short_name, date, subject, content, unique_id) VALUES (?, ?, ?, ?, ?, ?)",
-        (board, sender_short_name, date, subject, content, unique_id))
-    conn.commit()
-    if bbs_nodes and interface:
-        send_bulletin_to_bbs_nodes(board, sender_short_name, subject, content, unique_id, bbs_nodes, interface)
 
-    # New logic to send group chat notification for urgent bulletins
-    if board.lower() == "urgent":
-        notification_message = f"💥NEW URGENT BULLETIN💥\nFrom: {sender_short_name}\nTitle: {subject}\nDM 'CB,,Urgent' to view"
-        send_message(notification_message, BROADCAST_NUM, interface)
+    def on_commit(rowcount):
+        if not rowcount:
+            logging.info(f"Bulletin with unique_id {unique_id} already stored, skipping")
+            metrics.increment('sync.duplicate_bulletins')
+            return
+        if bbs_nodes and interface:
+            send_bulletin_to_bbs_nodes(board, sender_short_name, subject, content, unique_id, bbs_nodes, interface)
+
+        # Group chat notification for urgent bulletins, local or synced
+        if board.lower() == "urgent":
+            notification_message = f"💥NEW URGENT BULLETIN💥\nFrom: {sender_short_name}\nTitle: {subject}\nDM 'CB,,Urgent' to view"
+            urgent_broadcasts.add(unique_id, notification_message, f"Bulletin from {sender_short_name}: {subject}",
+                                  "DM 'CB,,Urgent' to view", interface)
 
+    pending = writes.submit(
+        "INSERT OR IGNORE INTO bulletins (board, sender_short_name, date, subject, content, unique_id) VALUES (?, ?, ?, ?, ?, ?)",
+        (board, sender_short_name, date, subject, content, unique_id), on_commit)
+    if wait:
+        pending.wait()
     return unique_id
 
 
+def bulletin_exists(unique_id):
+    c = get_db_connection().cursor()
+    c.execute("SELECT 1 FROM bulletins WHERE unique_id = ?", (unique_id,))
+    return c.fetchone() is not None
+
+
+def _keyset_page(table, columns, where, params, before_id, after_id, limit):
+    """
+    Reads one page of rows matching `where`, ordered by id, newest first. See db_connection.keyset_page.
+    """
+    return keyset_page(get_db_connection(), table, columns, where, params, before_id, after_id, limit)
+
+
 def get_bulletins(board):
     conn = get_db_connection()
     c = conn.cursor()
     c.execute("SELECT id, subject, sender_short_name, date, unique_id FROM bulletins WHERE board = ? COLLATE NOCASE", (board,))
     return c.fetchall()
 
+def count_bulletins(board):
+    c = get_db_connection().cursor()
+    c.execute("SELECT COUNT(*) FROM bulletins WHERE board = ? COLLATE NOCASE", (board,))
+    return c.fetchone()[0]
+
+
+def get_bulletin_page(board, before_id=None, after_id=None, limit=PAGE_SIZE):
+    """
+    Returns one page of a board, newest first, as (id, subject, sender_short_name, date, unique_id) rows.
+    See _keyset_page for the paging arguments and the return value.
+    """
+    return _keyset_page("bulletins", "id, subject, sender_short_name, date, unique_id",
+                        "board = ? COLLATE NOCASE", (board,), before_id, after_id, limit)
+
 def get_bulletin_content(bulletin_id):
     conn = get_db_connection()
     c = conn.cursor()
@@ -104,31 +127,75 @@ def get_bulletin_content(bulletin_id):
 
 
 def delete_bulletin(bulletin_id, bbs_nodes, interface):
-    conn = get_db_connection()
-    c = conn.cursor()
-    c.execute("DELETE FROM bulletins WHERE id = ?", (bulletin_id,))
-    conn.commit()
+    writes.flush()
+    with database.writer() as conn:
+        conn.execute("DELETE FROM bulletins WHERE id = ?", (bulletin_id,))
     send_delete_bulletin_to_bbs_nodes(bulletin_id, bbs_nodes, interface)
 
-def add_mail(sender_id, sender_short_name, recipient_id, subject, content, bbs_nodes, interface, unique_id=None):
-    conn = get_db_connection()
-    c = conn.cursor()
+def add_mail(sender_id, sender_short_name, recipient_id, subject, content, bbs_nodes, interface, unique_id=None, wait=True):
+    """
+    Stores a mail message through the write batcher and returns its unique_id.
+    See add_bulletin for the meaning of wait.
+    """
     date = datetime.now().strftime('%Y-%m-%d %H:%M')
     if not unique_id:
         unique_id = str(uuid.uuid4())
-    c.execute("INSERT INTO mail (sender, sender_short_name, recipient, date, subject, content, unique_id) VALUES (?, ?, ?, ?, ?, ?, ?)",
-              (sender_id, sender_short_name, recipient_id, date, subject, content, unique_id))
-    conn.commit()
-    if bbs_nodes and interface:
-        send_mail_to_bbs_nodes(sender_id, sender_short_name, recipient_id, subject, content, unique_id, bbs_nodes, interface)
+
+    def on_commit(rowcount):
+        if not rowcount:
+            logging.info(f"Mail with unique_id {unique_id} already stored, skipping")
+            metrics.increment('sync.duplicate_mail')
+            return
+        if bbs_nodes and interface:
+            send_mail_to_bbs_nodes(sender_id, sender_short_name, recipient_id, subject, content, unique_id, bbs_nodes, interface)
+
+    pending = writes.submit(
+        "INSERT OR IGNORE INTO mail (sender, sender_short_name, recipient, date, subject, content, unique_id) VALUES (?, ?, ?, ?, ?, ?, ?)",
+        (sender_id, sender_short_name, recipient_id, date, subject, content, unique_id), on_commit)
+    if wait:
+        pending.wait()
     return unique_id
 
+def mail_exists(unique_id):
+    c = get_db_connection().cursor()
+    c.execute("SELECT 1 FROM mail WHERE unique_id = ?", (unique_id,))
+    return c.fetchone() is not None
+
 def get_mail(recipient_id):
     conn = get_db_connection()
     c = conn.cursor()
     c.execute("SELECT id, sender_short_name, subject, date, unique_id FROM mail WHERE recipient = ?", (recipient_id,))
     return c.fetchall()
 
+def count_mail(recipient_id):
+    c = get_db_connection().cursor()
+    c.execute("SELECT total FROM mail_counts WHERE recipient = ?", (recipient_id,))
+    row = c.fetchone()
+    return row[0] if row else 0
+
+
+def count_unread_mail(recipient_id):
+    """
+    Returns the recipient's unread mail count from the trigger-maintained mail_counts table.
+    """
+    c = get_db_connection().cursor()
+    c.execute("SELECT unread FROM mail_counts WHERE recipient = ?", (recipient_id,))
+    row = c.fetchone()
+    return row[0] if row else 0
+
+
+def mark_mail_read(mail_id):
+    writes.submit("UPDATE mail SET read = 1 WHERE id = ? AND read = 0", (mail_id,))
+
+
+def get_mail_page(recipient_id, before_id=None, after_id=None, limit=PAGE_SIZE):
+    """
+    Returns one page of a mailbox, newest first, as (id, sender_short_name, subject, date, unique_id) rows.
+    See _keyset_page for the paging arguments and the return value.
+    """
+    return _keyset_page("mail", "id, sender_short_name, subject, date, unique_id",
+                        "recipient = ?", (recipient_id,), before_id, after_id, limit)
+
 def get_mail_content(mail_id, recipient_id):
     # TODO: ensure only recipient can read mail
     conn = get_db_connection()
@@ -137,8 +204,8 @@ def get_mail_content(mail_id, recipient_id):
     return c.fetchone()
 
 def delete_mail(unique_id, recipient_id, bbs_nodes, interface):
-    conn = get_db_connection()
-    c = conn.cursor()
+    writes.flush()
+    c = get_db_connection().cursor()
     try:
         c.execute("SELECT recipient FROM mail WHERE unique_id = ?", (unique_id,))
         result = c.fetchone()
@@ -147,8 +214,8 @@ def delete_mail(unique_id, recipient_id, bbs_nodes, interface):
             return  # Early exit if no matching mail found
         recipient_id = result[0]
         logging.info(f"Attempting to delete mail with unique_id: {unique_id} by {recipient_id}")
-        c.execute("DELETE FROM mail WHERE unique_id = ? and recipient = ?", (unique_id, recipient_id,))
-        conn.commit()
+        with database.writer() as conn:
+            conn.execute("DELETE FROM mail WHERE unique_id = ? and recipient = ?", (unique_id, recipient_id,))
         send_delete_mail_to_bbs_nodes(unique_id, bbs_nodes, interface)
         logging.info(f"Mail with unique_id: {unique_id} deleted and sync message sent.")
     except Exception as e:
@@ -164,3 +231,62 @@ def get_sender_id_by_mail_id(mail_id):
     if result:
         return result[0]
     return None
+
+
+def _prefix_range(prefix):
+    # Every string starting with prefix sorts in [prefix, upper)
+    return prefix, prefix[:-1] + chr(ord(prefix[-1]) + 1)
+
+
+def get_sync_ids(table, prefix=''):
+    """
+    Returns the unique_ids of live and deleted records in `table` ('bulletins' or 'mail')
+    that start with `prefix`. Used to build catch-up sync digests.
+    """
+    c = get_db_connection().cursor()
+    if prefix:
+        low, high = _prefix_range(prefix)
+        c.execute(f"SELECT unique_id FROM {table} WHERE unique_id >= ? AND unique_id < ?", (low, high))
+        ids = [row[0] for row in c.fetchall()]
+        c.execute("SELECT unique_id FROM sync_tombstones WHERE kind = ? AND unique_id >= ? AND unique_id < ?",
+                  (table, low, high))
+    else:
+        c.execute(f"SELECT unique_id FROM {table}")
+        ids = [row[0] for row in c.fetchall()]
+        c.execute("SELECT unique_id FROM sync_tombstones WHERE kind = ?", (table,))
+    ids.extend(row[0] for row in c.fetchall())
+    return ids
+
+
+def is_deleted(unique_id):
+    c = get_db_connection().cursor()
+    c.execute("SELECT 1 FROM sync_tombstones WHERE unique_id = ?", (unique_id,))
+    return c.fetchone() is not None
+
+
+def get_bulletins_by_id_prefix(short_ids):
+    """
+    Returns (board, sender_short_name, subject, content, unique_id) for bulletins whose
+    unique_id starts with one of `short_ids`.
+    """
+    c = get_db_connection().cursor()
+    records = []
+    for short_id in short_ids:
+        c.execute("SELECT board, sender_short_name, subject, content, unique_id FROM bulletins "
+                  "WHERE unique_id >= ? AND unique_id < ?", _prefix_range(short_id))
+        records.extend(c.fetchall())
+    return records
+
+
+def get_mail_by_id_prefix(short_ids):
+    """
+    Returns (sender, sender_short_name, recipient, subject, content, unique_id) for mail whose
+    unique_id starts with one of `short_ids`.
+    """
+    c = get_db_connection().cursor()
+    records = []
+    for short_id in short_ids:
+        c.execute("SELECT sender, sender_short_name, recipient, subject, content, unique_id FROM mail "
+                  "WHERE unique_id >= ? AND unique_id < ?", _prefix_range(short_id))
+        records.extend(c.fetchall())
+    return records
@@ -0,0 +1,177 @@
+import logging
+
+# Each migration upgrades the schema by one version. Versions are recorded in
+# PRAGMA user_version, so databases created by older releases are upgraded in
+# place the next time the server or db_admin starts. Append new migrations to
+# the end of this list; never edit one that has already shipped.
+
+
+def _create_base_tables(c):
+    c.execute('''CREATE TABLE IF NOT EXISTS bulletins (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    board TEXT NOT NULL,
+                    sender_short_name TEXT NOT NULL,
+                    date TEXT NOT NULL,
+                    subject TEXT NOT NULL,
+                    content TEXT NOT NULL,
+                    unique_id TEXT NOT NULL
+                )''')
+    c.execute('''CREATE TABLE IF NOT EXISTS mail (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    sender TEXT NOT NULL,
+                    sender_short_name TEXT NOT NULL,
+                    recipient TEXT NOT NULL,
+                    date TEXT NOT NULL,
+                    subject TEXT NOT NULL,
+                    content TEXT NOT NULL,
+                    unique_id TEXT NOT NULL
+                );''')
+    c.execute('''CREATE TABLE IF NOT EXISTS channels (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    name TEXT NOT NULL,
+                    url TEXT NOT NULL
+                );''')
+
+
+def _add_lookup_indexes(c):
+    # Sync retransmits may already have stored the same record twice; keep the oldest copy
+    # so the unique indexes can be built.
+    for table in ('bulletins', 'mail'):
+        c.execute(f"DELETE FROM {table} WHERE id NOT IN (SELECT MIN(id) FROM {table} GROUP BY unique_id)")
+        if c.rowcount:
+            logging.info(f"Removed {c.rowcount} duplicate row(s) from {table} before indexing unique_id")
+    c.execute("CREATE INDEX IF NOT EXISTS idx_bulletins_board_date ON bulletins (board COLLATE NOCASE, date)")
+    c.execute("CREATE UNIQUE INDEX IF NOT EXISTS idx_bulletins_unique_id ON bulletins (unique_id)")
+    c.execute("CREATE INDEX IF NOT EXISTS idx_mail_recipient_date ON mail (recipient, date)")
+    c.execute("CREATE UNIQUE INDEX IF NOT EXISTS idx_mail_unique_id ON mail (unique_id)")
+
+
+def _add_sync_tombstones(c):
+    # Remember the unique_id of every deleted bulletin and mail so that catch-up sync with a
+    # peer that still has the record does not bring it back. Triggers also cover db_admin.py.
+    c.execute('''CREATE TABLE IF NOT EXISTS sync_tombstones (
+                    unique_id TEXT PRIMARY KEY,
+                    kind TEXT NOT NULL,
+                    deleted_at TEXT NOT NULL DEFAULT CURRENT_TIMESTAMP
+                ) WITHOUT ROWID''')
+    c.execute("CREATE INDEX IF NOT EXISTS idx_sync_tombstones_kind ON sync_tombstones (kind, unique_id)")
+    for table in ('bulletins', 'mail'):
+        c.execute(f'''CREATE TRIGGER IF NOT EXISTS trg_{table}_tombstone AFTER DELETE ON {table}
+                      BEGIN
+                          INSERT OR IGNORE INTO sync_tombstones (unique_id, kind) VALUES (OLD.unique_id, '{table}');
+                      END''')
+
+
+def _add_sync_outbox(c):
+    # Sync records waiting for a peer's ack. Fields are stored as a JSON array.
+    c.execute('''CREATE TABLE IF NOT EXISTS sync_outbox (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    peer TEXT NOT NULL,
+                    kind TEXT NOT NULL,
+                    fields TEXT NOT NULL,
+                    created_at REAL NOT NULL,
+                    attempts INTEGER NOT NULL DEFAULT 0,
+                    next_attempt REAL NOT NULL
+                )''')
+    c.execute("CREATE INDEX IF NOT EXISTS idx_sync_outbox_due ON sync_outbox (next_attempt)")
+    c.execute("CREATE INDEX IF NOT EXISTS idx_sync_outbox_peer ON sync_outbox (peer)")
+
+
+def _add_session_journal(c):
+    # Append-only log of user conversation states; state is JSON, NULL once cleared
+    c.execute('''CREATE TABLE IF NOT EXISTS session_journal (
+                    seq INTEGER PRIMARY KEY AUTOINCREMENT,
+                    user_id INTEGER NOT NULL,
+                    state TEXT,
+                    written_at REAL NOT NULL
+                )''')
+    c.execute("CREATE INDEX IF NOT EXISTS idx_session_journal_user ON session_journal (user_id, seq)")
+
+
+def _add_keyset_indexes(c):
+    # Listings page through a board or mailbox by id, newest first. Nothing sorts
+    # by date, so the (…, date) indexes are replaced rather than kept alongside.
+    c.execute("DROP INDEX IF EXISTS idx_bulletins_board_date")
+    c.execute("DROP INDEX IF EXISTS idx_mail_recipient_date")
+    c.execute("CREATE INDEX IF NOT EXISTS idx_bulletins_board_id ON bulletins (board COLLATE NOCASE, id)")
+    c.execute("CREATE INDEX IF NOT EXISTS idx_mail_recipient_id ON mail (recipient, id)")
+
+
+def _add_mail_counts(c):
+    # Read flag per mail, and per-recipient totals kept up to date by triggers so
+    # the main menu header is a primary key lookup. Existing mail counts as unread.
+    c.execute("ALTER TABLE mail ADD COLUMN read INTEGER NOT NULL DEFAULT 0")
+    c.execute('''CREATE TABLE IF NOT EXISTS mail_counts (
+                    recipient TEXT PRIMARY KEY,
+                    total INTEGER NOT NULL DEFAULT 0,
+                    unread INTEGER NOT NULL DEFAULT 0
+                ) WITHOUT ROWID''')
+    c.execute("""INSERT OR REPLACE INTO mail_counts (recipient, total, unread)
+                 SELECT recipient, COUNT(*), SUM(read = 0) FROM mail GROUP BY recipient""")
+    c.execute('''CREATE TRIGGER IF NOT EXISTS trg_mail_count_insert AFTER INSERT ON mail
+                  BEGIN
+                      INSERT OR IGNORE INTO mail_counts (recipient) VALUES (NEW.recipient);
+                      UPDATE mail_counts SET total = total + 1, unread = unread + (NEW.read = 0)
+                      WHERE recipient = NEW.recipient;
+                  END''')
+    c.execute('''CREATE TRIGGER IF NOT EXISTS trg_mail_count_delete AFTER DELETE ON mail
+                  BEGIN
+                      UPDATE mail_counts SET total = total - 1, unread = unread - (OLD.read = 0)
+                      WHERE recipient = OLD.recipient;
+                  END''')
+    c.execute('''CREATE TRIGGER IF NOT EXISTS trg_mail_count_read AFTER UPDATE OF read ON mail
+                  WHEN OLD.read != NEW.read
+                  BEGIN
+                      UPDATE mail_counts SET unread = unread + (NEW.read = 0) - (OLD.read = 0)
+                      WHERE recipient = NEW.recipient;
+                  END''')
+
+
+MIGRATIONS = [
+    _create_base_tables,
+    _add_lookup_indexes,
+    _add_sync_tombstones,
+    _add_sync_outbox,
+    _add_session_journal,
+    _add_keyset_indexes,
+    _add_mail_counts,
+]
+
+SCHEMA_VERSION = len(MIGRATIONS)
+
+
+def get_schema_version(conn):
+    return conn.execute("PRAGMA user_version").fetchone()[0]
+
+
+def migrate(conn):
+    """
+    Brings the database schema up to SCHEMA_VERSION.
+
+    Each pending migration runs in its own transaction together with the
+    version bump, so an interrupted upgrade resumes where it stopped.
+
+    Args:
+        conn (sqlite3.Connection): Connection to the BBS database.
+
+    Returns:
+        int: The schema version after migrating.
+    """
+    version = get_schema_version(conn)
+    if version > SCHEMA_VERSION:
+        logging.warning(f"Database schema version {version} is newer than this release ({SCHEMA_VERSION})")
+        return version
+
+    for target in range(version + 1, SCHEMA_VERSION + 1):
+        c = conn.cursor()
+        try:
+            c.execute("BEGIN")
+            MIGRATIONS[target - 1](c)
+            c.execute(f"PRAGMA user_version = {target}")
+            c.execute("COMMIT")
+        except Exception:
+            c.execute("ROLLBACK")
+            logging.error(f"Database migration to schema version {target} failed")
+            raise
+        logging.info(f"Database schema upgraded to version {target}")
+    return SCHEMA_VERSION
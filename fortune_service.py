@@ -0,0 +1,137 @@
+import bisect
+import logging
+import os
+import random
+import threading
+import time
+from array import array
+
+logger = logging.getLogger(__name__)
+
+
+class FortunePack:
+    """
+    One fortune file, held in memory with an index of where each fortune starts and ends.
+
+    Picking a fortune is a random index into the offset table and a slice of
+    the file's bytes; the file is never read on a request. The bytes are a
+    private copy, so truncating or rewriting the file in place cannot make a
+    slice fail before the change is noticed. Blank lines are not
+    indexed. The file's mtime is checked at most every `check_interval`
+    seconds and the index is rebuilt when it changed.
+
+    Args:
+        path (str): The fortune file, one fortune per line.
+        check_interval (float): Minimum seconds between checks for a changed file.
+    """
+
+    def __init__(self, path, check_interval=30):
+        self.path = path
+        self.check_interval = check_interval
+        self._data = b''
+        self._starts = array('Q')
+        self._ends = array('Q')
+        self._mtime = None
+        self._checked = 0
+        self._lock = threading.Lock()
+        self._load()
+
+    def __len__(self):
+        return len(self._starts)
+
+    def choice(self):
+        """
+        Returns a random fortune from this pack, or None if it has none.
+        """
+        with self._lock:
+            if not self._starts:
+                return None
+            index = random.randrange(len(self._starts))
+            return self._data[self._starts[index]:self._ends[index]].decode('utf-8', errors='replace').strip()
+
+    def refresh(self):
+        """
+        Reloads the file if it changed since it was indexed. Returns True if it was reloaded.
+        """
+        now = time.monotonic()
+        if now - self._checked < self.check_interval:
+            return False
+        with self._lock:
+            self._checked = now
+            if self._file_mtime() == self._mtime:
+                return False
+            self._load()
+            return True
+
+    def _file_mtime(self):
+        try:
+            return os.stat(self.path).st_mtime_ns
+        except OSError:
+            return None
+
+    def _load(self):
+        self._mtime = self._file_mtime()
+        self._checked = time.monotonic()
+        starts, ends = array('Q'), array('Q')
+        data = b''
+        try:
+            with open(self.path, 'rb') as file:
+                data = file.read()
+        except OSError as e:
+            logger.warning(f"Fortune file {self.path} could not be loaded: {e}")
+
+        start = 0
+        size = len(data)
+        while start < size:
+            end = data.find(b'\n', start)
+            if end < 0:
+                end = size
+            if data[start:end].strip():
+                starts.append(start)
+                ends.append(end)
+            start = end + 1
+
+        self._data, self._starts, self._ends = data, starts, ends
+        logger.info(f"Indexed {len(starts)} fortune(s) from {self.path}")
+
+
+class FortuneService:
+    """
+    Random fortunes drawn evenly from every configured fortune pack.
+
+    Args:
+        paths (list): Fortune files to serve.
+    """
+
+    def __init__(self, paths):
+        self.paths = list(paths)
+        self.packs = [FortunePack(path) for path in self.paths]
+        self._rebuild_totals()
+
+    @staticmethod
+    def configured_paths(snapshot):
+        """
+        Returns the files of the [fortune] files setting, a comma separated list (default fortunes.txt).
+        """
+        files = snapshot['config'].get('fortune', 'files', fallback='fortunes.txt')
+        return [path.strip() for path in files.split(',') if path.strip()]
+
+    def _rebuild_totals(self):
+        totals = []
+        total = 0
+        for pack in self.packs:
+            total += len(pack)
+            totals.append(total)
+        self._totals = totals
+
+    def random(self):
+        """
+        Returns a random fortune, or None when no pack has any.
+        """
+        if any([pack.refresh() for pack in self.packs]):
+            self._rebuild_totals()
+        if not self._totals or not self._totals[-1]:
+            return None
+        # Weigh each pack by its size so every fortune is equally likely
+        pack_index = bisect.bisect_right(self._totals, random.randrange(self._totals[-1]))
+        return self.packs[pack_index].choice()
@@ -0,0 +1,89 @@
+import logging
+import queue
+import threading
+import zlib
+
+import metrics
+
+
+class InboundDispatcher:
+    """
+    Hands received packets to a pool of worker threads.
+
+    Every sender is pinned to one worker, so a user's messages are processed
+    in the order they arrived (conversation steps in the user sessions depend on
+    that), while different users are served in parallel. The radio thread
+    only enqueues.
+
+    Each worker has a bounded queue. When it is full, submit() waits up to
+    `put_timeout` seconds for room and then drops the packet, so a flood from
+    one sender slows intake briefly instead of growing memory without limit.
+
+    Args:
+        handler (callable): Called as handler(*args) on a worker thread.
+        workers (int): Number of worker threads.
+        queue_size (int): Maximum packets waiting per worker.
+        put_timeout (float): Seconds submit() waits for room before dropping.
+    """
+
+    def __init__(self, handler, workers=4, queue_size=64, put_timeout=0.5):
+        self.handler = handler
+        self.put_timeout = put_timeout
+        self._queues = [queue.Queue(maxsize=queue_size) for _ in range(workers)]
+        self._threads = []
+        self._lock = threading.Lock()
+
+    def start(self):
+        with self._lock:
+            if self._threads:
+                return
+            for index, work in enumerate(self._queues):
+                thread = threading.Thread(target=self._run, args=(work,), name=f'inbound-{index}', daemon=True)
+                thread.start()
+                self._threads.append(thread)
+
+    def stop(self, timeout=None):
+        """
+        Lets the workers finish what is queued and stops them.
+        """
+        with self._lock:
+            threads, self._threads = self._threads, []
+        for work in self._queues:
+            work.put(None)
+        for thread in threads:
+            thread.join(timeout)
+
+    def _worker_for(self, key):
+        # crc32 rather than hash() so a sender keeps its worker across restarts
+        return self._queues[zlib.crc32(str(key).encode('utf-8')) % len(self._queues)]
+
+    def submit(self, key, *args):
+        """
+        Queues handler(*args) on the worker that owns `key`.
+
+        Returns:
+            bool: False if the packet was dropped because the worker is backed up.
+        """
+        try:
+            self._worker_for(key).put(args, timeout=self.put_timeout)
+        except queue.Full:
+            metrics.increment('inbound.dropped')
+            logging.warning(f"Inbound queue full, dropped packet from {key}")
+            return False
+        metrics.increment('inbound.queued')
+        return True
+
+    def pending(self):
+        return sum(work.qsize() for work in self._queues)
+
+    def _run(self, work):
+        while True:
+            args = work.get()
+            if args is None:
+                return
+            try:
+                self.handler(*args)
+            except Exception as e:
+                logging.error(f"Error handling inbound packet: {e}")
+            metrics.increment('inbound.processed')
+            metrics.set_gauge('inbound.pending', self.pending())
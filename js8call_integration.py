@@ -1,16 +1,15 @@
-from socket import socket, AF_INET, SOCK_STREAM
+from socket import socket, AF_INET, SOCK_STREAM, SHUT_RDWR
 import json
 import time
-import sqlite3
-import configparser
 import logging
+import threading
 
-from meshtastic import BROADCAST_NUM
-
+import metrics
 from command_handlers import handle_help_command
-from utils import send_message, update_user_state
-
-config_file = 'config.ini'
+from config_init import config_manager
+from js8call_store import get_store
+from paging import PAGE_COMMANDS, page_cursor, page_footer, page_state
+from utils import send_message, update_user_state, urgent_broadcasts
 
 def from_message(content):
     try:
@@ -24,151 +23,202 @@ def to_message(typ, value='', params=None):
     return json.dumps({'type': typ, 'value': value, 'params': params})
 
 
+# Message types JS8Call sends for received traffic
+RX_TYPES = frozenset([
+    'RX.ACTIVITY', 'RX.DIRECTED', 'RX.SPOT', 'RX.CALL_ACTIVITY',
+    'RX.CALL_SELECTED', 'RX.DIRECTED_ME', 'RX.ECHO', 'RX.DIRECTED_GROUP',
+    'RX.META', 'RX.MSG', 'RX.PING', 'RX.PONG', 'RX.STREAM'
+])
+
+
+def parse_directed(value):
+    """
+    Splits the text of an RX.DIRECTED message into (sender, receiver, message), or returns None.
+    """
+    parts = value.split(' ')
+    if len(parts) < 3:
+        return None
+    return parts[0], parts[1], ' '.join(parts[2:]).strip()
+
+
+def count_rx(message):
+    metrics.increment(f"js8call.{message['type'].lower()}")
+
+
+# Seconds to wait before reconnecting to JS8Call, doubled after every failed attempt
+RECONNECT_DELAY = 2
+MAX_RECONNECT_DELAY = 300
+
+
+class LineDecoder:
+    """
+    Splits the JS8Call API stream into messages.
+
+    JS8Call writes one JSON object per line, but TCP delivers bytes in
+    arbitrary pieces: a read can hold several messages or part of one. Bytes
+    are buffered until a newline completes a message, and a partial line
+    longer than `max_line` is discarded.
+
+    Args:
+        max_line (int): Longest partial line kept while waiting for its newline.
+    """
+
+    def __init__(self, max_line=65536):
+        self.max_line = max_line
+        self._buffer = bytearray()
+
+    def feed(self, data):
+        """
+        Adds received bytes and returns the messages they completed, skipping invalid JSON.
+        """
+        self._buffer += data
+        messages = []
+        start = 0
+        while True:
+            end = self._buffer.find(b'\n', start)
+            if end < 0:
+                break
+            line = self._buffer[start:end].strip()
+            start = end + 1
+            if line:
+                message = from_message(line.decode('utf-8', errors='replace'))
+                if message:
+                    messages.append(message)
+        del self._buffer[:start]
+        if len(self._buffer) > self.max_line:
+            logging.warning(f"Discarding {len(self._buffer)} bytes of JS8Call data without a line break")
+            self._buffer.clear()
+        return messages
+
+    def reset(self):
+        self._buffer.clear()
+
+
 class JS8CallClient:
     def __init__(self, interface, logger=None):
         self.logger = logger or logging.getLogger('js8call')
         self.logger.setLevel(logging.INFO)
         self.logger.propagate = False
 
-        self.config = configparser.ConfigParser()
-        self.config.read(config_file)
+        self.config = config_manager.current['config']
 
         self.server = (
             self.config.get('js8call', 'host', fallback=None),
             self.config.getint('js8call', 'port', fallback=None)
         )
         self.db_file = self.config.get('js8call', 'db_file', fallback=None)
-        self.js8groups = self.config.get('js8call', 'js8groups', fallback='').split(',')
-        self.store_messages = self.config.getboolean('js8call', 'store_messages', fallback=True)
-        self.js8urgent = self.config.get('js8call', 'js8urgent', fallback='').split(',')
-        self.js8groups = [group.strip() for group in self.js8groups]
-        self.js8urgent = [group.strip() for group in self.js8urgent]
+        self.apply_config(config_manager.current)
+        # Group routing follows config reloads; host, port and db_file need a restart
+        config_manager.subscribe(self.apply_config)
 
         self.connected = False
         self.sock = None
-        self.db_conn = None
+        self.store = None
         self.interface = interface
+        self.decoder = LineDecoder()
+        self._running = False
+        self._stop = threading.Event()
+        self._thread = None
+        self._send_lock = threading.Lock()
+        self.handlers = {}  # message type -> handlers, see subscribe()
 
         if self.db_file:
-            self.db_conn = sqlite3.connect(self.db_file)
-            self.create_tables()
+            self.store = get_store()
+            self.store.initialize()
+            self.subscribe('RX.DIRECTED', self.on_directed)
+            self.subscribe('RX.DIRECTED', self.notify_urgent)
+            self.subscribe('RX.SPOT', self.on_spot)
+            self.subscribe('RX.ACTIVITY', self.on_activity)
+            self.subscribe(RX_TYPES, count_rx)
         else:
             self.logger.info("JS8Call configuration not found. Skipping JS8Call integration.")
 
-    def create_tables(self):
-        if not self.db_conn:
-            return
+    def subscribe(self, types, handler):
+        """
+        Calls handler(message) on the client thread for every received message of the given type(s).
 
-        with self.db_conn:
-            self.db_conn.execute('''
-                CREATE TABLE IF NOT EXISTS messages (
-                    id INTEGER PRIMARY KEY AUTOINCREMENT,
-                    sender TEXT,
-                    receiver TEXT,
-                    message TEXT,
-                    timestamp DATETIME DEFAULT CURRENT_TIMESTAMP
-                )
-            ''')
-            self.db_conn.execute('''
-                CREATE TABLE IF NOT EXISTS groups (
-                    id INTEGER PRIMARY KEY AUTOINCREMENT,
-                    sender TEXT,
-                    groupname TEXT,
-                    message TEXT,
-                    timestamp DATETIME DEFAULT CURRENT_TIMESTAMP
-                )
-            ''')
-            self.db_conn.execute('''
-                CREATE TABLE IF NOT EXISTS urgent (
-                    id INTEGER PRIMARY KEY AUTOINCREMENT,
-                    sender TEXT,
-                    groupname TEXT,
-                    message TEXT,
-                    timestamp DATETIME DEFAULT CURRENT_TIMESTAMP
-                )
-            ''')
-        self.logger.info("Database tables created or verified.")
+        Handlers run in the order they subscribed and must not block: they hold
+        up the socket reader. Writes go through the store's batcher, which is
+        why storing a decode is cheap.
 
-    def insert_message(self, table, sender, recipient, message):
+        Args:
+            types (str or iterable): One message type, e.g. 'RX.SPOT', or several.
+            handler (callable): Called with the decoded message dict.
         """
-        Inserts a message into the specified table in the database.
-
-        This method saves a message along with its sender and receiver or group name into the specified table.
-        If the database connection is not available, it logs an error message.
-
-        Parameters:
-        -----------
-        table : str
-            The name of the table where the message should be inserted. It can be 'messages', 'groups', or 'urgent'.
-        
-        sender : str
-            The meshtastic node identifier of the sender who issued the command
-        
-        recipient : str
-            The identifier of the receiver of the message or the group name.
-        
-        message : str
-            The content of the message.
-
-        Example Usage:
-        --------------
-        client.insert_message('messages', sender='CALLSIGN1', receiver_or_group='CALLSIGN2', message='This is a message.')
-        client.insert_message('groups', sender='CALLSIGN1', receiver_or_group='GroupName', message='This is a group message.')
-        client.insert_message('urgent', sender='CALLSIGN1', receiver_or_group='UrgentGroupName', message='This is an urgent message.')
+        for typ in ([types] if isinstance(types, str) else types):
+            # Replace rather than append so process() never sees a tuple change under it
+            self.handlers[typ] = self.handlers.get(typ, ()) + (handler,)
+
+    def apply_config(self, snapshot):
+        config = snapshot['config']
+        self.config = config
+        self.js8groups = [group.strip() for group in config.get('js8call', 'js8groups', fallback='').split(',')]
+        self.store_messages = config.getboolean('js8call', 'store_messages', fallback=True)
+        self.js8urgent = [group.strip() for group in config.get('js8call', 'js8urgent', fallback='').split(',')]
+
+    def insert_message(self, table, sender, recipient, message):
         """
+        Stores a received message in the 'messages', 'groups' or 'urgent' table.
 
-        if not self.db_conn:
+        The insert is batched with the other decodes of the same cycle and not waited for.
+        """
+        if not self.store:
             self.logger.error("Database connection is not available.")
             return
 
         try:
-            with self.db_conn:
-                self.db_conn.execute(f'''
-                    INSERT INTO {table} (sender, { 'receiver' if table == 'messages' else 'groupname' }, message)
-                    VALUES (?, ?, ?)
-                ''', (sender, receiver_or_group, message))
-        except sqlite3.Error as e:
+            self.store.insert_message(table, sender, recipient, message)
+        except ValueError as e:
             self.logger.error(f"Failed to insert message into {table} table: {e}")
 
     def process(self, message):
-        typ = message.get('type', '')
-        value = message.get('value', '')
-        params = message.get('params', {})
-
-        if not typ:
+        handlers = self.handlers.get(message.get('type'))
+        if not handlers:
             return
+        for handler in handlers:
+            try:
+                handler(message)
+            except Exception as e:
+                self.logger.error(f"Error in JS8Call {message['type']} handler: {e}")
 
-        rx_types = [
-            'RX.ACTIVITY', 'RX.DIRECTED', 'RX.SPOT', 'RX.CALL_ACTIVITY',
-            'RX.CALL_SELECTED', 'RX.DIRECTED_ME', 'RX.ECHO', 'RX.DIRECTED_GROUP',
-            'RX.META', 'RX.MSG', 'RX.PING', 'RX.PONG', 'RX.STREAM'
-        ]
-
-        if typ not in rx_types:
+    def on_directed(self, message):
+        value = message.get('value', '')
+        if not value:
             return
+        parsed = parse_directed(value)
+        if parsed is None:
+            self.logger.warning(f"Unexpected message format: {value}")
+            return
+        sender, receiver, msg = parsed
+
+        self.logger.info(f"Received JS8Call message: {sender} to {receiver} - {msg}")
+
+        if receiver in self.js8urgent:
+            self.insert_message('urgent', sender, receiver, msg)
+        elif receiver in self.js8groups:
+            self.insert_message('groups', sender, receiver, msg)
+        elif self.store_messages:
+            self.insert_message('messages', sender, receiver, msg)
+
+    def notify_urgent(self, message):
+        parsed = parse_directed(message.get('value', ''))
+        if parsed is not None and parsed[1] in self.js8urgent:
+            sender, receiver, msg = parsed
+            notification_message = f"💥 URGENT JS8Call Message Received 💥\nFrom: {sender}\nCheck BBS for message"
+            # Relayed copies of the same message are only announced once
+            urgent_broadcasts.add(f"js8:{sender}:{receiver}:{msg}", notification_message,
+                                  f"JS8Call from {sender}", "Check BBS for message", self.interface)
+
+    def on_spot(self, message):
+        params = message.get('params', {})
+        if params.get('CALL'):
+            self.store.record_spot(params['CALL'], params.get('GRID', '').strip(), params.get('FREQ'), params.get('SNR'))
 
-        if typ == 'RX.DIRECTED' and value:
-            parts = value.split(' ')
-            if len(parts) < 3:
-                self.logger.warning(f"Unexpected message format: {value}")
-                return
-
-            sender = parts[0]
-            receiver = parts[1]
-            msg = ' '.join(parts[2:]).strip()
-
-            self.logger.info(f"Received JS8Call message: {sender} to {receiver} - {msg}")
-
-            if receiver in self.js8urgent:
-                self.insert_urgent('urgent', sender, receiver, msg)
-                notification_message = f"💥 URGENT JS8Call Message Received 💥\nFrom: {sender}\nCheck BBS for message"
-                send_message(notification_message, BROADCAST_NUM, self.interface)
-            elif receiver in self.js8groups:
-                self.insert_message('groups', sender, receiver, msg)
-            elif self.store_messages:
-                self.insert_message('messages', sender, receiver, msg)
-        else:
-            pass
+    def on_activity(self, message):
+        params = message.get('params', {})
+        text = message.get('value', '').strip()
+        if text:
+            self.store.record_activity(params.get('FREQ'), params.get('SNR'), text)
 
     def send(self, *args, **kwargs):
         params = kwargs.get('params', {})
@@ -176,54 +226,162 @@ class JS8CallClient:
             params['_ID'] = '{}'.format(int(time.time() * 1000))
             kwargs['params'] = params
         message = to_message(*args, **kwargs)
-        self.sock.send((message + '\n').encode('utf-8'))  # Convert to bytes
+        with self._send_lock:
+            if not self.connected:
+                self.logger.warning(f"Not connected to JS8Call, dropping {args[0] if args else 'message'}")
+                return
+            self.sock.sendall((message + '\n').encode('utf-8'))  # Convert to bytes
 
-    def connect(self):
+    def start(self):
+        """
+        Connects to JS8Call on a background thread, reconnecting with backoff whenever the connection drops.
+        """
         if not self.server[0] or not self.server[1]:
             self.logger.info("JS8Call server configuration not found. Skipping JS8Call connection.")
             return
+        if self._running:
+            return
+        self._running = True
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name='js8call', daemon=True)
+        self._thread.start()
+
+    def _run(self):
+        delay = RECONNECT_DELAY
+        while self._running:
+            try:
+                if self.connect():
+                    delay = RECONNECT_DELAY  # JS8Call was talking to us, start over with a short delay
+            except ConnectionRefusedError:
+                self.logger.error(f"Connection to JS8Call server {self.server} refused.")
+            except OSError as e:
+                if self._running:
+                    self.logger.error(f"JS8Call connection error: {e}")
+            if not self._running:
+                return
+            self.logger.info(f"Reconnecting to JS8Call in {delay} seconds")
+            self._stop.wait(delay)
+            delay = min(delay * 2, MAX_RECONNECT_DELAY)
+
+    def connect(self):
+        """
+        Opens one connection and processes messages until JS8Call closes it or close() is called.
 
+        Returns:
+            bool: True if any message was received on the connection.
+        """
         self.logger.info(f"Connecting to {self.server}")
         self.sock = socket(AF_INET, SOCK_STREAM)
+        self.decoder.reset()
+        received = False
         try:
             self.sock.connect(self.server)
             self.connected = True
             self.send("STATION.GET_STATUS")
 
-            while self.connected:
-                content = self.sock.recv(65500).decode('utf-8')  # Decode received bytes to string
-                if not content:
-                    continue  # Skip empty content
-
-                try:
-                    message = json.loads(content)
-                except ValueError:
-                    continue  # Skip invalid JSON content
-
-                if not message:
-                    continue  # Skip empty message
-
-                self.process(message)
-        except ConnectionRefusedError:
-            self.logger.error(f"Connection to JS8Call server {self.server} refused.")
+            while self._running:
+                data = self.sock.recv(65500)  # Blocks until data arrives
+                if not data:
+                    self.logger.warning("JS8Call closed the connection.")
+                    return received
+                for message in self.decoder.feed(data):
+                    received = True
+                    self.process(message)
+            return received
         finally:
+            with self._send_lock:
+                self.connected = False
             self.sock.close()
 
     def close(self):
-        self.connected = False
+        self._running = False
+        self._stop.set()
+        sock = self.sock
+        if sock is not None and self.connected:
+            try:
+                sock.shutdown(SHUT_RDWR)  # Wakes the blocked recv()
+            except OSError:
+                pass
+        if self._thread is not None:
+            self._thread.join(timeout=5)
+            self._thread = None
 
 
 def handle_js8call_command(sender_id, interface):
-    response = "JS8Call Menu:\n[G]roup Messages\n[S]tation Messages\n[U]rgent Messages\nE[X]IT"
+    response = "JS8Call Menu:\n[G]roup Messages\n[S]tation Messages\n[U]rgent Messages\n[H]eard Stations\nE[X]IT"
     send_message(response, sender_id, interface)
     update_user_state(sender_id, {'command': 'JS8CALL_MENU', 'step': 1})
 
 
+def _view_window():
+    # Listings only reach back [js8call] view_hours (default 24)
+    return config_manager.current['config'].getint('js8call', 'view_hours', fallback=24) * 3600
+
+
+def _format_station_message(msg):
+    return f"{msg[1]} -> {msg[2]}: {msg[3]} ({msg[4]})"
+
+
+def _format_group_message(msg):
+    return f"{msg[1]}: {msg[2]} ({msg[3]})"
+
+
+# View -> (title, page query, row formatter)
+JS8CALL_VIEWS = {
+    'station': ("Station Messages",
+                lambda group, *cursor: get_store().get_station_page(_view_window(), *cursor),
+                _format_station_message),
+    'urgent': ("Urgent Messages",
+               lambda group, *cursor: get_store().get_urgent_page(_view_window(), *cursor),
+               _format_station_message),
+    'group': ("Messages for group {group}",
+              lambda group, *cursor: get_store().get_group_page(group, _view_window(), *cursor),
+              _format_group_message),
+}
+
+
+def send_js8call_page(sender_id, interface, view, group=None, before_id=None, after_id=None):
+    """
+    Sends one page of a JS8Call listing, newest first.
+
+    With more pages to see, the user stays on the listing for [N]ext/[P]rev;
+    otherwise they are returned to the JS8Call menu.
+
+    Returns:
+        bool: False if the page is empty.
+    """
+    title, get_page, format_row = JS8CALL_VIEWS[view]
+    rows, has_older, has_newer = get_page(group, before_id, after_id)
+    if not rows:
+        return False
+    response = f"{title.format(group=group)}:\n" + "\n".join(format_row(row) for row in rows)
+    footer = page_footer(has_older, has_newer)
+    if footer:
+        send_message(response + footer + "  E[X]IT", sender_id, interface)
+        update_user_state(sender_id, {'command': 'JS8CALL_MENU', 'step': 2, 'view': view, 'group': group,
+                                      **page_state(rows, has_older, has_newer)})
+    else:
+        send_message(response, sender_id, interface)
+        handle_js8call_command(sender_id, interface)
+    return True
+
+
 def handle_js8call_steps(sender_id, message, step, interface, state):
     message = message.lower().strip()
     if len(message) == 2 and message[1] == 'x':
         message = message[0]
 
+    if step == 2:
+        if message in PAGE_COMMANDS:
+            cursor = page_cursor(message, state)
+            if cursor is None or not send_js8call_page(sender_id, interface, state['view'], state['group'], *cursor):
+                send_message("No more messages that way.", sender_id, interface)
+            return
+        if message == 'x':
+            handle_js8call_command(sender_id, interface)
+            return
+        step = 1  # Anything else is a choice from the JS8Call menu
+
     if step == 1:
         choice = message
         if choice == 'x':
@@ -235,6 +393,8 @@ def handle_js8call_steps(sender_id, message, step, interface, state):
             handle_station_messages_command(sender_id, interface)
         elif choice == 'u':
             handle_urgent_messages_command(sender_id, interface)
+        elif choice == 'h':
+            handle_heard_stations_command(sender_id, interface)
         else:
             send_message("Invalid option. Please choose again.", sender_id, interface)
             handle_js8call_command(sender_id, interface)
@@ -242,10 +402,7 @@ def handle_js8call_steps(sender_id, message, step, interface, state):
 
 
 def handle_group_messages_command(sender_id, interface):
-    conn = sqlite3.connect('js8call.db')
-    c = conn.cursor()
-    c.execute("SELECT DISTINCT groupname FROM groups")
-    groups = c.fetchall()
+    groups = get_store().get_group_names(_view_window())
     if groups:
         response = "Group Messages Menu:\n" + "\n".join([f"[{i}] {group[0]}" for i, group in enumerate(groups)])
         send_message(response, sender_id, interface)
@@ -255,27 +412,25 @@ def handle_group_messages_command(sender_id, interface):
         handle_js8call_command(sender_id, interface)
 
 def handle_station_messages_command(sender_id, interface):
-    conn = sqlite3.connect('js8call.db')
-    c = conn.cursor()
-    c.execute("SELECT sender, receiver, message, timestamp FROM messages")
-    messages = c.fetchall()
-    if messages:
-        response = "Station Messages:\n" + "\n".join([f"[{i+1}] {msg[0]} -> {msg[1]}: {msg[2]} ({msg[3]})" for i, msg in enumerate(messages)])
-        send_message(response, sender_id, interface)
-    else:
+    if not send_js8call_page(sender_id, interface, 'station'):
         send_message("No station messages available.", sender_id, interface)
-    handle_js8call_command(sender_id, interface)
+        handle_js8call_command(sender_id, interface)
 
 def handle_urgent_messages_command(sender_id, interface):
-    conn = sqlite3.connect('js8call.db')
-    c = conn.cursor()
-    c.execute("SELECT sender, groupname, message, timestamp FROM urgent")
-    messages = c.fetchall()
-    if messages:
-        response = "Urgent Messages:\n" + "\n".join([f"[{i+1}] {msg[0]} -> {msg[1]}: {msg[2]} ({msg[3]})" for i, msg in enumerate(messages)])
+    if not send_js8call_page(sender_id, interface, 'urgent'):
+        send_message("No urgent messages available.", sender_id, interface)
+        handle_js8call_command(sender_id, interface)
+
+def handle_heard_stations_command(sender_id, interface):
+    spots = get_store().get_spots(_view_window())
+    if spots:
+        response = "Heard Stations:\n" + "\n".join(
+            f"{callsign} {grid or '-'} {snr if snr is not None else '?'}dB x{count} "
+            f"{time.strftime('%H:%M', time.gmtime(last_heard))}Z"
+            for callsign, grid, freq, snr, count, last_heard in spots)
         send_message(response, sender_id, interface)
     else:
-        send_message("No urgent messages available.", sender_id, interface)
+        send_message("No stations heard.", sender_id, interface)
     handle_js8call_command(sender_id, interface)
 
 def handle_group_message_selection(sender_id, message, step, state, interface):
@@ -283,19 +438,11 @@ def handle_group_message_selection(sender_id, message, step, state, interface):
     try:
         group_index = int(message)
         groupname = groups[group_index][0]
-
-        conn = sqlite3.connect('js8call.db')
-        c = conn.cursor()
-        c.execute("SELECT sender, message, timestamp FROM groups WHERE groupname=?", (groupname,))
-        messages = c.fetchall()
-
-        if messages:
-            response = f"Messages for group {groupname}:\n" + "\n".join([f"[{i+1}] {msg[0]}: {msg[1]} ({msg[2]})" for i, msg in enumerate(messages)])
-            send_message(response, sender_id, interface)
-        else:
-            send_message(f"No messages for group {groupname}.", sender_id, interface)
     except (IndexError, ValueError):
         send_message("Invalid group selection. Please choose again.", sender_id, interface)
         handle_group_messages_command(sender_id, interface)
+        return
 
-    handle_js8call_command(sender_id, interface)
\ No newline at end of file
+    if not send_js8call_page(sender_id, interface, 'group', groupname):
+        send_message(f"No messages for group {groupname}.", sender_id, interface)
+        handle_js8call_command(sender_id, interface)
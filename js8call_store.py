@@ -0,0 +1,270 @@
+import logging
+import threading
+import time
+
+from config_init import config_manager
+from db_connection import ConnectionManager, keyset_page
+from write_batcher import WriteBatcher
+
+# Column holding the addressee in each message table
+RECIPIENT_COLUMNS = {
+    'messages': 'receiver',
+    'groups': 'groupname',
+    'urgent': 'groupname',
+}
+
+# Rows per page of a JS8Call listing
+PAGE_SIZE = 5
+
+
+def _cutoff(seconds):
+    # Same format as SQLite's CURRENT_TIMESTAMP (UTC), so it compares as text
+    return time.strftime('%Y-%m-%d %H:%M:%S', time.gmtime(time.time() - seconds))
+
+
+class JS8CallStore:
+    """
+    The JS8Call message database.
+
+    Reads use the pooled per-thread connections of a ConnectionManager and
+    inserts go through a WriteBatcher, so all the decodes of a busy JS8Call
+    cycle are committed in one transaction instead of one fsync each. The
+    schema is created on first use.
+
+    Listings only cover a recent time window and are paged newest first. A
+    retention job prunes messages older than the configured number of days,
+    or moves them to archive tables, so the live tables stay small.
+
+    Args:
+        db_file (str): Path of the JS8Call database.
+        window (float): Seconds to collect inserts before committing them together.
+    """
+
+    def __init__(self, db_file, window=0.5):
+        self.db_file = db_file
+        self.database = ConnectionManager(db_file)
+        self.writes = WriteBatcher(self.database, window=window)
+        self._ready = False
+        self._ready_lock = threading.Lock()
+        self._timer = None
+
+    def initialize(self):
+        with self._ready_lock:
+            if self._ready:
+                return
+            with self.database.writer() as conn:
+                for table, recipient in RECIPIENT_COLUMNS.items():
+                    conn.execute(f'''
+                        CREATE TABLE IF NOT EXISTS {table} (
+                            id INTEGER PRIMARY KEY AUTOINCREMENT,
+                            sender TEXT,
+                            {recipient} TEXT,
+                            message TEXT,
+                            timestamp DATETIME DEFAULT CURRENT_TIMESTAMP
+                        )
+                    ''')
+                conn.execute("CREATE INDEX IF NOT EXISTS idx_groups_groupname_timestamp ON groups (groupname, timestamp)")
+                conn.execute("CREATE INDEX IF NOT EXISTS idx_messages_timestamp ON messages (timestamp)")
+                conn.execute("CREATE INDEX IF NOT EXISTS idx_urgent_timestamp ON urgent (timestamp)")
+                # One row per station heard, updated in place
+                conn.execute('''
+                    CREATE TABLE IF NOT EXISTS spots (
+                        callsign TEXT PRIMARY KEY,
+                        grid TEXT,
+                        freq INTEGER,
+                        snr INTEGER,
+                        heard_count INTEGER NOT NULL DEFAULT 1,
+                        last_heard INTEGER NOT NULL
+                    ) WITHOUT ROWID
+                ''')
+                conn.execute("CREATE INDEX IF NOT EXISTS idx_spots_last_heard ON spots (last_heard)")
+                # Band activity, kept for [js8call] activity_hours
+                conn.execute('''
+                    CREATE TABLE IF NOT EXISTS activity (
+                        id INTEGER PRIMARY KEY,
+                        heard_at INTEGER NOT NULL,
+                        freq INTEGER,
+                        snr INTEGER,
+                        text TEXT
+                    )
+                ''')
+                conn.execute("CREATE INDEX IF NOT EXISTS idx_activity_heard_at ON activity (heard_at)")
+                for table, recipient in RECIPIENT_COLUMNS.items():
+                    # Archived rows keep their ids, so archiving twice is harmless
+                    conn.execute(f'''
+                        CREATE TABLE IF NOT EXISTS {table}_archive (
+                            id INTEGER PRIMARY KEY,
+                            sender TEXT,
+                            {recipient} TEXT,
+                            message TEXT,
+                            timestamp DATETIME
+                        )
+                    ''')
+            self._ready = True
+        logging.info(f"JS8Call database {self.db_file} ready.")
+
+    def _reader(self):
+        if not self._ready:
+            self.initialize()
+        return self.database.reader()
+
+    def insert_message(self, table, sender, recipient, message):
+        """
+        Queues a message for the 'messages', 'groups' or 'urgent' table without waiting for the commit.
+
+        Returns:
+            PendingWrite: Handle that can be waited on for the commit.
+        """
+        if table not in RECIPIENT_COLUMNS:
+            raise ValueError(f"Unknown JS8Call message table {table}")
+        if not self._ready:
+            self.initialize()
+        return self.writes.submit(
+            f"INSERT INTO {table} (sender, {RECIPIENT_COLUMNS[table]}, message) VALUES (?, ?, ?)",
+            (sender, recipient, message))
+
+    def record_spot(self, callsign, grid, freq, snr):
+        """
+        Queues an update of the station's row in spots. A blank grid keeps the one already known.
+        """
+        if not self._ready:
+            self.initialize()
+        return self.writes.submit(
+            "INSERT INTO spots (callsign, grid, freq, snr, last_heard) VALUES (?, ?, ?, ?, ?) "
+            "ON CONFLICT(callsign) DO UPDATE SET grid = COALESCE(NULLIF(excluded.grid, ''), grid), "
+            "freq = excluded.freq, snr = excluded.snr, heard_count = heard_count + 1, last_heard = excluded.last_heard",
+            (callsign, grid, freq, snr, int(time.time())))
+
+    def record_activity(self, freq, snr, text):
+        if not self._ready:
+            self.initialize()
+        return self.writes.submit("INSERT INTO activity (heard_at, freq, snr, text) VALUES (?, ?, ?, ?)",
+                                  (int(time.time()), freq, snr, text))
+
+    def get_spots(self, window, limit=10):
+        """
+        Returns the stations heard in the last `window` seconds, most recent first,
+        as (callsign, grid, freq, snr, heard_count, last_heard) rows.
+        """
+        c = self._reader().cursor()
+        c.execute("SELECT callsign, grid, freq, snr, heard_count, last_heard FROM spots "
+                  "WHERE last_heard >= ? ORDER BY last_heard DESC LIMIT ?", (int(time.time() - window), limit))
+        return c.fetchall()
+
+    def get_group_names(self, window):
+        """
+        Returns the groups with messages in the last `window` seconds.
+        """
+        c = self._reader().cursor()
+        c.execute("SELECT DISTINCT groupname FROM groups WHERE timestamp >= ?", (_cutoff(window),))
+        return c.fetchall()
+
+    def _page(self, table, columns, where, params, window, before_id, after_id, limit):
+        return keyset_page(self._reader(), table, columns, f"{where} AND timestamp >= ?",
+                           params + (_cutoff(window),), before_id, after_id, limit)
+
+    def get_group_page(self, groupname, window, before_id=None, after_id=None, limit=PAGE_SIZE):
+        """
+        Returns one page of a group's messages from the last `window` seconds, newest first,
+        as (id, sender, message, timestamp) rows. See db_connection.keyset_page for the rest.
+        """
+        return self._page("groups", "id, sender, message, timestamp", "groupname = ?", (groupname,),
+                          window, before_id, after_id, limit)
+
+    def get_station_page(self, window, before_id=None, after_id=None, limit=PAGE_SIZE):
+        """
+        Returns one page of station messages as (id, sender, receiver, message, timestamp) rows.
+        """
+        return self._page("messages", "id, sender, receiver, message, timestamp", "1", (),
+                          window, before_id, after_id, limit)
+
+    def get_urgent_page(self, window, before_id=None, after_id=None, limit=PAGE_SIZE):
+        """
+        Returns one page of urgent messages as (id, sender, groupname, message, timestamp) rows.
+        """
+        return self._page("urgent", "id, sender, groupname, message, timestamp", "1", (),
+                          window, before_id, after_id, limit)
+
+    def apply_retention(self, days, archive=False):
+        """
+        Removes messages older than `days` days, moving them to the archive tables first if `archive` is set.
+        """
+        if not self._ready:
+            self.initialize()
+        cutoff = _cutoff(days * 86400)
+        removed = 0
+        for table in RECIPIENT_COLUMNS:
+            # One transaction per table: a failed archive copy rolls back the delete with it
+            with self.database.writer() as conn:
+                if archive:
+                    conn.execute(f"INSERT OR IGNORE INTO {table}_archive SELECT * FROM {table} WHERE timestamp < ?",
+                                 (cutoff,))
+                removed += conn.execute(f"DELETE FROM {table} WHERE timestamp < ?", (cutoff,)).rowcount
+        if removed:
+            logging.info(f"{'Archived' if archive else 'Pruned'} {removed} JS8Call message(s) older than {days} days")
+        return removed
+
+    def prune_rolling(self, activity_hours, spot_days=0):
+        """
+        Drops band activity older than `activity_hours` and stations not heard for `spot_days` (0 keeps them).
+        """
+        if not self._ready:
+            self.initialize()
+        now = time.time()
+        self.writes.submit("DELETE FROM activity WHERE heard_at < ?", (int(now - activity_hours * 3600),))
+        if spot_days > 0:
+            self.writes.submit("DELETE FROM spots WHERE last_heard < ?", (int(now - spot_days * 86400),))
+
+    def start_retention(self, interval=3600):
+        """
+        Applies the [js8call] retention_days, archive and activity_hours settings now and then
+        every `interval` seconds.
+        """
+        self.retention_interval = interval
+        self._run_retention()
+
+    def _run_retention(self):
+        config = config_manager.current['config']
+        try:
+            days = config.getint('js8call', 'retention_days', fallback=30)
+            if days > 0:
+                self.apply_retention(days, config.getboolean('js8call', 'archive', fallback=False))
+            self.prune_rolling(config.getint('js8call', 'activity_hours', fallback=24), days)
+        except Exception as e:
+            logging.error(f"JS8Call retention job failed: {e}")
+        self._timer = threading.Timer(self.retention_interval, self._run_retention)
+        self._timer.daemon = True
+        self._timer.start()
+
+    def close(self):
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        self.writes.stop()
+        self.database.close()
+
+
+_store = None
+_store_lock = threading.Lock()
+
+
+def get_store():
+    """
+    Returns the store of the configured [js8call] db_file, opening it on first use.
+
+    The configuration must be loaded first. db_file needs a restart to change,
+    like the rest of the connection settings.
+    """
+    global _store
+    with _store_lock:
+        if _store is None:
+            _store = JS8CallStore(config_manager.current['config'].get('js8call', 'db_file', fallback='js8call.db'))
+        return _store
+
+
+def close_store():
+    global _store
+    with _store_lock:
+        if _store is not None:
+            _store.close()
+            _store = None
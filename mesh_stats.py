@@ -0,0 +1,194 @@
+import logging
+import threading
+import time
+from array import array
+from collections import Counter
+
+# Last-heard windows shown by the Stats menu, in minutes
+WINDOWS = {
+    "Last 24 hours": 24 * 60,
+    "Last 8 hours": 8 * 60,
+    "Last hour": 60,
+}
+HISTORY_HOURS = 7 * 24
+
+
+class MeshStats:
+    """
+    Rolling statistics about the nodes of the mesh, updated as events arrive.
+
+    Every node's last-heard time is counted in a per-minute bucket, and each
+    window in WINDOWS keeps a running total that is adjusted when a node is
+    heard again and when minutes slide out of the window, so counts are exact
+    to the minute. Hardware model and role counters change only when a node's
+    info changes. Reading any of them costs the same however many nodes the
+    mesh has.
+
+    The number of distinct nodes heard in each hour of the last week is kept
+    in a 168 slot ring buffer.
+
+    Args:
+        interface (meshtastic.stream_interface.StreamInterface): The Meshtastic interface, used to seed the counters.
+    """
+
+    def __init__(self, interface):
+        self._lock = threading.Lock()
+        self._nodes = {}  # node_id -> [last_heard_minute, hw_model, role]
+        self._hw_models = Counter()
+        self._roles = Counter()
+        self._buckets = Counter()  # minute -> nodes whose last heard time falls in it
+        now = self._minute(time.time())
+        self._window_start = {name: now - length for name, length in WINDOWS.items()}
+        self._window_counts = {name: 0 for name in WINDOWS}
+        self._hourly = array('H', [0] * HISTORY_HOURS)
+        self._hourly_base = now // 60 - HISTORY_HOURS + 1  # Hour stored in slot 0 of the ring
+        self._counted_hour = {}  # node_id -> last hour the node was counted in _hourly
+
+        for node_id, node in list((interface.nodes or {}).items()):
+            self.update_node(node_id, node)
+
+    @staticmethod
+    def _minute(timestamp):
+        return int(timestamp) // 60
+
+    def update_node(self, node_id, node):
+        """
+        Applies a node from interface.nodes or a 'meshtastic.node.updated' event.
+        """
+        user = node.get('user', {})
+        last_heard = node.get('lastHeard')
+        with self._lock:
+            self._set_info(node_id, user.get('hwModel', 'Unknown'), user.get('role', 'Unknown'))
+            if last_heard is not None:
+                self._heard(node_id, self._minute(last_heard))
+
+    def heard(self, node_id, timestamp=None):
+        """
+        Records that a packet from node_id was received at timestamp (now if None).
+        """
+        with self._lock:
+            if node_id not in self._nodes:
+                self._set_info(node_id, 'Unknown', 'Unknown')
+            self._heard(node_id, self._minute(timestamp or time.time()))
+
+    def _set_info(self, node_id, hw_model, role):
+        entry = self._nodes.get(node_id)
+        if entry is None:
+            self._nodes[node_id] = [None, hw_model, role]
+            self._hw_models[hw_model] += 1
+            self._roles[role] += 1
+            return
+        if entry[1] != hw_model:
+            self._hw_models[entry[1]] -= 1
+            self._hw_models[hw_model] += 1
+            entry[1] = hw_model
+        if entry[2] != role:
+            self._roles[entry[2]] -= 1
+            self._roles[role] += 1
+            entry[2] = role
+
+    def _heard(self, node_id, minute):
+        entry = self._nodes[node_id]
+        previous = entry[0]
+        if previous is not None and minute <= previous:
+            return
+        now = self._minute(time.time())
+        self._advance(now)
+
+        if previous is not None and previous in self._buckets:
+            self._buckets[previous] -= 1
+            if not self._buckets[previous]:
+                del self._buckets[previous]
+            for name, start in self._window_start.items():
+                if previous >= start:
+                    self._window_counts[name] -= 1
+        entry[0] = minute
+        self._buckets[minute] += 1
+        for name, start in self._window_start.items():
+            if minute >= start:
+                self._window_counts[name] += 1
+
+        hour = minute // 60
+        if self._hourly_base <= hour < self._hourly_base + HISTORY_HOURS and self._counted_hour.get(node_id) != hour:
+            self._counted_hour[node_id] = hour
+            self._hourly[hour % HISTORY_HOURS] += 1
+
+    def _advance(self, now):
+        # Slide every window to end at `now`, dropping the minutes that fell out of it
+        for name, length in WINDOWS.items():
+            start = self._window_start[name]
+            new_start = now - length
+            if new_start <= start:
+                continue
+            if new_start - start > length:
+                self._window_counts[name] = sum(count for minute, count in self._buckets.items() if minute >= new_start)
+            else:
+                for minute in range(start, new_start):
+                    self._window_counts[name] -= self._buckets.get(minute, 0)
+            self._window_start[name] = new_start
+
+        # Buckets older than the longest window are never read again
+        oldest = now - max(WINDOWS.values())
+        if len(self._buckets) > max(WINDOWS.values()):
+            for minute in [minute for minute in self._buckets if minute < oldest]:
+                del self._buckets[minute]
+
+        new_base = now // 60 - HISTORY_HOURS + 1
+        if new_base > self._hourly_base:
+            for hour in range(self._hourly_base, min(new_base, self._hourly_base + HISTORY_HOURS)):
+                self._hourly[hour % HISTORY_HOURS] = 0
+            self._hourly_base = new_base
+
+    def node_counts(self):
+        """
+        Returns [(period, nodes heard)] for "All time" and every window in WINDOWS.
+        """
+        with self._lock:
+            self._advance(self._minute(time.time()))
+            return [("All time", len(self._nodes))] + [(name, self._window_counts[name]) for name in WINDOWS]
+
+    def hardware_models(self):
+        with self._lock:
+            return {model: count for model, count in self._hw_models.items() if count}
+
+    def roles(self):
+        with self._lock:
+            return {role: count for role, count in self._roles.items() if count}
+
+    def hourly_history(self, hours=HISTORY_HOURS):
+        """
+        Returns the number of distinct nodes heard in each of the last `hours` hours, oldest first.
+        """
+        with self._lock:
+            self._advance(self._minute(time.time()))
+            first = self._hourly_base + HISTORY_HOURS - min(hours, HISTORY_HOURS)
+            return [self._hourly[hour % HISTORY_HOURS] for hour in range(first, self._hourly_base + HISTORY_HOURS)]
+
+
+def get_mesh_stats(interface):
+    stats = getattr(interface, 'mesh_stats', None)
+    if stats is None:
+        stats = MeshStats(interface)
+        interface.mesh_stats = stats
+    return stats
+
+
+def on_node_updated(node, interface):
+    """
+    pubsub callback for 'meshtastic.node.updated'.
+    """
+    node_id = node.get('user', {}).get('id')
+    if node_id:
+        get_mesh_stats(interface).update_node(node_id, node)
+
+
+def on_packet(packet, interface):
+    """
+    pubsub callback for received packets; counts the sender as heard.
+    """
+    node_id = packet.get('fromId')
+    if node_id:
+        try:
+            get_mesh_stats(interface).heard(node_id, packet.get('rxTime'))
+        except Exception as e:
+            logging.error(f"Error updating mesh stats: {e}")
@@ -0,0 +1,110 @@
+import re
+import unicodedata
+
+# Meshtastic rejects text payloads above DATA_PAYLOAD_LEN (233 bytes); keep a little headroom.
+MAX_PAYLOAD_BYTES = 228
+
+_WORD_RE = re.compile(r'\S*\s*')
+
+# Characters that must stay attached to the character before them
+# (zero width joiner, variation selectors, skin tone modifiers)
+_JOINERS = {'\u200d', '\ufe0e', '\ufe0f'}
+
+
+def _is_continuation(char, previous):
+    if char in _JOINERS or previous == '\u200d':
+        return True
+    if '\U0001f3fb' <= char <= '\U0001f3ff':
+        return True
+    return unicodedata.combining(char) != 0
+
+
+def _split_clusters(text):
+    """
+    Splits text into characters, keeping emoji sequences and combining marks together.
+    """
+    clusters = []
+    previous = ''
+    for char in text:
+        if clusters and _is_continuation(char, previous):
+            clusters[-1] += char
+        else:
+            clusters.append(char)
+        previous = char
+    return clusters
+
+
+def _split_units(text, level):
+    if level == 0:
+        return text.splitlines(keepends=True)
+    if level == 1:
+        return [word for word in _WORD_RE.findall(text) if word]
+    return _split_clusters(text)
+
+
+def _pack(text, max_bytes, level, frames, current):
+    """
+    Greedily fills frames with units of the given level, falling back to
+    smaller units (lines, then words, then characters) for anything that
+    does not fit in a frame on its own.
+    """
+    for unit in _split_units(text, level):
+        if frames and not current[0]:
+            # A frame boundary already breaks the text, so a new frame never starts with whitespace
+            unit = unit.lstrip()
+            if not unit:
+                continue
+        size = len(unit.encode('utf-8'))
+        # Trailing whitespace is dropped if the unit ends the frame, so it does not count against the budget
+        fit = len(unit.rstrip().encode('utf-8'))
+        if not fit or current[1] + fit <= max_bytes:
+            current[0].append(unit)
+            current[1] += size
+            continue
+
+        if current[0]:
+            _close_frame(frames, current)
+            unit = unit.lstrip()
+            size = len(unit.encode('utf-8'))
+            fit = len(unit.rstrip().encode('utf-8'))
+
+        if fit <= max_bytes or level == 2:
+            # A single cluster larger than a frame cannot be split safely; send it on its own
+            current[0].append(unit)
+            current[1] = size
+        else:
+            _pack(unit, max_bytes, level + 1, frames, current)
+
+
+def _close_frame(frames, current):
+    frame = ''.join(current[0]).rstrip()
+    if frame:
+        frames.append(frame)
+    current[0], current[1] = [], 0
+
+
+def pack_message(message, max_bytes=MAX_PAYLOAD_BYTES):
+    """
+    Splits a message into frames that each fit in `max_bytes` of UTF-8.
+
+    Frames are filled as close to the byte budget as possible. Splits happen
+    on line boundaries where possible, then on word boundaries, and never
+    inside a UTF-8 sequence or an emoji sequence.
+
+    Whitespace at a split is dropped, as the frame boundary already breaks the text:
+
+    >>> pack_message('a' * 228 + '\\n' + 'b' * 10) == ['a' * 228, 'b' * 10]
+    True
+
+    Args:
+        message (str): The text to send.
+        max_bytes (int): The byte budget of a single frame.
+
+    Returns:
+        list: The frames, in order.
+    """
+    frames = []
+    current = [[], 0]
+    _pack(message, max_bytes, 0, frames, current)
+    _close_frame(frames, current)
+    return frames
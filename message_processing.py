@@ -1,8 +1,7 @@
-# Standard and Meshtastic imports
+# Standard imports
 import logging
 
-from meshtastic import BROADCAST_NUM
-
+from command_router import CommandRouter
 # Imports from existing command handlers
 from command_handlers import (
     handle_mail_command, handle_bulletin_command, handle_help_command, handle_stats_command, handle_fortune_command,
@@ -15,16 +14,27 @@ from command_handlers import (
     handle_blackjack_command
 )
 # Imports from database operations
-from db_operations import add_bulletin, add_mail, delete_bulletin, delete_mail, get_db_connection, add_channel
+from db_operations import (
+    add_bulletin, add_mail, delete_bulletin, delete_mail, get_db_connection, add_channel,
+    bulletin_exists, mail_exists, is_deleted
+)
 # Imports from JS8Call integration
 from js8call_integration import handle_js8call_command, handle_js8call_steps, handle_group_message_selection
+# Imports for the BBS sync formats
+from sync_codec import SYNC_PREFIX, decode_frame, is_sync_message as is_sync_text, parse_legacy
+from sync_reconcile import handle_digest, handle_have, handle_want
+from sync_transport import SequenceTracker
 # Imports from utilities
 from utils import get_user_state, get_node_short_name, get_node_id_from_num, send_message
+import metrics
 
 # Import the BlackJack module
 # Ensure that blackjack.py is located in the plugins/games/ folder
 import plugins.games.blackjack as bj
 
+# Last frame sequence number seen from each BBS peer
+sync_sequences = SequenceTracker()
+
 # Handler dictionaries for the different BBS menus
 main_menu_handlers = {
     "q": handle_quick_help_command,
@@ -69,6 +79,136 @@ board_action_handlers = {
     "x": handle_help_command
 }
 
+
+def handle_blackjack_message(sender_id, message, state, interface, bbs_nodes):
+    """
+    Passes messages to the BlackJack game while one is in progress.
+    Returns True when the game consumed the message.
+    """
+    if message.lower().strip() in ('x', 'xx'):
+        logging.info(f"BLACKJACK_DEBUG: User {sender_id} exiting BlackJack game with 'x'.")
+        handle_help_command(sender_id, interface) # Return to main menu
+        return True
+
+    game_response = bj.handle_message(sender_id, message.strip())
+    if game_response: # If Blackjack handled the message and returned a response string
+        send_message(game_response, sender_id, interface)
+        return True
+    # Not a game command, let the router try the menus
+    return False
+
+
+# Routes user messages to their handlers, see CommandRouter for the lookup order.
+# Plugins register their commands, menus and conversation steps here.
+router = CommandRouter(fallback=handle_help_command)
+
+router.register_interceptor('BLACKJACK_GAME', handle_blackjack_message)
+
+# Quick commands (sm,, cm, pb,, cb,, chp,, chl)
+router.register_quick_command("sm,,", lambda sender_id, message, state, interface, bbs_nodes:
+                              handle_send_mail_command(sender_id, message.strip(), interface, bbs_nodes))
+router.register_quick_command("cm", lambda sender_id, message, state, interface, bbs_nodes:
+                              handle_check_mail_command(sender_id, interface))
+router.register_quick_command("pb,,", lambda sender_id, message, state, interface, bbs_nodes:
+                              handle_post_bulletin_command(sender_id, message.strip(), interface, bbs_nodes))
+router.register_quick_command("cb,,", lambda sender_id, message, state, interface, bbs_nodes:
+                              handle_check_bulletin_command(sender_id, message.strip(), interface))
+router.register_quick_command("chp,,", lambda sender_id, message, state, interface, bbs_nodes:
+                              handle_post_channel_command(sender_id, message.strip(), interface))
+router.register_quick_command("chl", lambda sender_id, message, state, interface, bbs_nodes:
+                              handle_list_channels_command(sender_id, interface))
+
+# JS8Call screens take every message, including 'x'
+router.register_state('JS8CALL_MENU', lambda sender_id, message, state, interface, bbs_nodes:
+                      handle_js8call_steps(sender_id, message, state['step'], interface, state))
+router.register_state('GROUP_MESSAGES', lambda sender_id, message, state, interface, bbs_nodes:
+                      handle_group_message_selection(sender_id, message, state['step'], state, interface))
+
+# Menus
+router.register_menu(main_menu_handlers)
+router.register_menu(bbs_menu_handlers, 'MENU', 'bbs')
+router.register_menu(utilities_menu_handlers, 'MENU', 'utilities')
+router.register_menu(games_menu_handlers, 'MENU', 'games')
+router.register_menu(bulletin_menu_handlers, 'BULLETIN_MENU')
+router.register_menu(board_action_handlers, 'BULLETIN_ACTION', pass_state=True)
+
+# Multi-message command steps (mail, bulletin, stats, etc.)
+router.register_step('MAIL', lambda sender_id, message, state, interface, bbs_nodes:
+                     handle_mail_steps(sender_id, message, state['step'], state, interface, bbs_nodes))
+router.register_step('BULLETIN', lambda sender_id, message, state, interface, bbs_nodes:
+                     handle_bb_steps(sender_id, message, state['step'], state, interface, bbs_nodes))
+router.register_step('STATS', lambda sender_id, message, state, interface, bbs_nodes:
+                     handle_stats_steps(sender_id, message, state['step'], interface))
+router.register_step('CHANNEL_DIRECTORY', lambda sender_id, message, state, interface, bbs_nodes:
+                     handle_channel_directory_steps(sender_id, message, state['step'], state, interface))
+router.register_step('CHECK_MAIL', lambda sender_id, message, state, interface, bbs_nodes:
+                     handle_read_mail_command(sender_id, message, state, interface), step=1)
+router.register_step('CHECK_MAIL', lambda sender_id, message, state, interface, bbs_nodes:
+                     handle_delete_mail_confirmation(sender_id, message, state, interface, bbs_nodes), step=2)
+router.register_step('CHECK_BULLETIN', lambda sender_id, message, state, interface, bbs_nodes:
+                     handle_read_bulletin_command(sender_id, message, state, interface), step=1)
+router.register_step('CHECK_CHANNEL', lambda sender_id, message, state, interface, bbs_nodes:
+                     handle_read_channel_command(sender_id, message, state, interface), step=1)
+router.register_step('LIST_CHANNELS', lambda sender_id, message, state, interface, bbs_nodes:
+                     handle_read_channel_command(sender_id, message, state, interface), step=1)
+router.register_step('BULLETIN_POST', lambda sender_id, message, state, interface, bbs_nodes:
+                     handle_bb_steps(sender_id, message, 4, state, interface, bbs_nodes))
+router.register_step('BULLETIN_POST_CONTENT', lambda sender_id, message, state, interface, bbs_nodes:
+                     handle_bb_steps(sender_id, message, 5, state, interface, bbs_nodes))
+router.register_step('BULLETIN_READ', lambda sender_id, message, state, interface, bbs_nodes:
+                     handle_bb_steps(sender_id, message, 3, state, interface, bbs_nodes))
+
+def process_sync_record(kind, fields, interface, peer=None):
+    """
+    Applies a single sync record received from another BBS node.
+
+    Args:
+        kind (str): The record type, e.g. 'BULLETIN' or 'DELETE_MAIL'.
+        fields (list): The record fields, in legacy message order.
+        interface (meshtastic.stream_interface.StreamInterface): The Meshtastic interface object.
+        peer (str): Node ID of the BBS node that sent the record, used to answer catch-up requests.
+    """
+    if kind in ("BULLETIN", "MAIL") and is_deleted(fields[-1]):
+        logging.info(f"SERVER SYNC: Ignoring {kind.lower()} with unique_id {fields[-1]}, it was deleted here")
+        metrics.increment('sync.deleted_records_ignored')
+        return
+
+    if kind == "BULLETIN":
+        board, sender_short_name, subject, content, unique_id = fields[0], fields[1], fields[2], fields[3], fields[4]
+        if bulletin_exists(unique_id):
+            logging.info(f"SERVER SYNC: Ignoring duplicate bulletin with unique_id: {unique_id}")
+            metrics.increment('sync.duplicate_bulletins')
+            return
+        metrics.increment('sync.received_bulletins')
+        # add_bulletin announces urgent bulletins once the row has committed
+        add_bulletin(board, sender_short_name, subject, content, [], interface, unique_id=unique_id, wait=False)
+    elif kind == "MAIL":
+        sender_id, sender_short_name, recipient_id, subject, content, unique_id = fields[0], fields[1], fields[2], fields[3], fields[4], fields[5]
+        if mail_exists(unique_id):
+            logging.info(f"SERVER SYNC: Ignoring duplicate mail with unique_id: {unique_id}")
+            metrics.increment('sync.duplicate_mail')
+            return
+        metrics.increment('sync.received_mail')
+        add_mail(sender_id, sender_short_name, recipient_id, subject, content, [], interface, unique_id=unique_id, wait=False)
+    elif kind == "DELETE_BULLETIN":
+        unique_id = fields[0]
+        delete_bulletin(unique_id, [], interface)
+    elif kind == "DELETE_MAIL":
+        unique_id = fields[0]
+        logging.info(f"Processing mail deletion with unique_id: {unique_id}")
+        recipient_id = get_recipient_id_by_mail(unique_id)
+        delete_mail(unique_id, recipient_id, [], interface)
+    elif kind == "CHANNEL":
+        channel_name, channel_url = fields[0], fields[1]
+        add_channel(channel_name, channel_url)
+    elif kind == "DIGEST":
+        handle_digest(peer, fields, interface)
+    elif kind == "HAVE":
+        handle_have(peer, fields, interface)
+    elif kind == "WANT":
+        handle_want(peer, fields, interface)
+
+
 def process_message(sender_id, message, interface, is_sync_message=False):
     """
     Processes a received Meshtastic message, whether it's a user command
@@ -82,7 +222,6 @@ def process_message(sender_id, message, interface, is_sync_message=False):
     """
     state = get_user_state(sender_id)
     message_lower = message.lower().strip()
-    message_strip = message.strip()
 
     bbs_nodes = interface.bbs_nodes
 
@@ -92,141 +231,26 @@ def process_message(sender_id, message, interface, is_sync_message=False):
 
     if is_sync_message:
         # Logic for processing sync messages (bulletins, mail, deletions)
-        if message.startswith("BULLETIN|"):
-            parts = message.split("|")
-            board, sender_short_name, subject, content, unique_id = parts[1], parts[2], parts[3], parts[4], parts[5]
-            add_bulletin(board, sender_short_name, subject, content, [], interface, unique_id=unique_id)
-
-            if board.lower() == "urgent":
-                notification_message = f"💥NEW URGENT BULLETIN💥\nFrom: {sender_short_name}\nTitle: {subject}\nDM 'CB,,Urgent' to view"
-                send_message(notification_message, BROADCAST_NUM, interface)
-        elif message.startswith("MAIL|"):
-            parts = message.split("|")
-            sender_id, sender_short_name, recipient_id, subject, content, unique_id = parts[1], parts[2], parts[3], parts[4], parts[5], parts[6]
-            add_mail(sender_id, sender_short_name, recipient_id, subject, content, [], interface, unique_id=unique_id)
-        elif message.startswith("DELETE_BULLETIN|"):
-            unique_id = message.split("|")[1]
-            delete_bulletin(unique_id, [], interface)
-        elif message.startswith("DELETE_MAIL|"):
-            unique_id = message.split("|")[1]
-            logging.info(f"Processing mail deletion with unique_id: {unique_id}")
-            recipient_id = get_recipient_id_by_mail(unique_id)
-            delete_mail(unique_id, recipient_id, [], interface)
-        elif message.startswith("CHANNEL|"):
-            parts = message.split("|")
-            channel_name, channel_url = parts[1], parts[2]
-            add_channel(channel_name, channel_url)
-    else:
-        # Logic for processing normal user commands
-
-        # Special handling for 'x' when in BLACKJACK_GAME state to exit to main menu
-        if state and state['command'] == 'BLACKJACK_GAME' and message_lower == 'x':
-            logging.info(f"BLACKJACK_DEBUG: User {sender_id} exiting BlackJack game with 'x'.")
-            handle_help_command(sender_id, interface) # Return to main menu
-            return # Exit process_message
-
-        # If a Blackjack game is in progress for this user, try to process as a game command.
-        if state and state['command'] == 'BLACKJACK_GAME':
-            game_response = bj.handle_message(sender_id, message_strip)
-            if game_response: # If Blackjack handled the message and returned a response string
-                send_message(game_response, sender_id, interface)
-                return # Game command handled, exit process_message
-            # If bj.handle_message returned None, it means it was not a recognized game command
-            # other than 'x' (which is handled above). We let it fall through to default help or
-            # the blackjack.py will have sent an "Invalid move" message already.
-            pass # No additional action needed here as blackjack.py already sends messages
-        
-        # Handle quick commands (sm,, cm, pb,, cb,, chp,, chl)
-        if message_lower.startswith("sm,,"):
-            handle_send_mail_command(sender_id, message_strip, interface, bbs_nodes)
-        elif message_lower.startswith("cm"):
-            handle_check_mail_command(sender_id, interface)
-        elif message_lower.startswith("pb,,"):
-            handle_post_bulletin_command(sender_id, message_strip, interface, bbs_nodes)
-        elif message_lower.startswith("cb,,"):
-            handle_check_bulletin_command(sender_id, message_strip, interface)
-        elif message_lower.startswith("chp,,"):
-            handle_post_channel_command(sender_id, message_strip, interface)
-        elif message_lower.startswith("chl"):
-            handle_list_channels_command(sender_id, interface)
-        else:
-            # Handle commands based on user state (menus, conversation steps)
-            if state and state['command'] == 'MENU':
-                menu_name = state['menu']
-                if menu_name == 'bbs':
-                    handlers = bbs_menu_handlers
-                elif menu_name == 'utilities':
-                    handlers = utilities_menu_handlers
-                elif menu_name == 'games': # New 'games' menu
-                    handlers = games_menu_handlers
-                else: # Default to main menu if menu state is not recognized
-                    handlers = main_menu_handlers
-            elif state and state['command'] == 'BULLETIN_MENU':
-                handlers = bulletin_menu_handlers
-            elif state and state['command'] == 'BULLETIN_ACTION':
-                handlers = board_action_handlers
-            elif state and state['command'] == 'JS8CALL_MENU':
-                handle_js8call_steps(sender_id, message, state['step'], interface, state)
-                return
-            elif state and state['command'] == 'GROUP_MESSAGES':
-                handle_group_message_selection(sender_id, message, state['step'], state, interface)
-                return
-            else: # Default to main menu if no state or unknown state
-                handlers = main_menu_handlers
-
-            if message_lower == 'x':
-                # Reset to main menu state
-                handle_help_command(sender_id, interface)
+        if message.startswith(SYNC_PREFIX):
+            try:
+                sequence, records = decode_frame(message)
+            except ValueError as e:
+                logging.error(f"SERVER SYNC: Dropping sync frame from {sender_id}: {e}")
+                metrics.increment('sync.bad_frames')
                 return
+            sync_sequences.observe(sender_id, sequence)
+        else:
+            records = [parse_legacy(message)]
 
-            if message_lower in handlers:
-                # Call the appropriate handler for the menu or board action
-                if state and state['command'] in ['BULLETIN_ACTION', 'BULLETIN_READ', 'BULLETIN_POST', 'BULLETIN_POST_CONTENT']:
-                    handlers[message_lower](sender_id, interface, state)
-                else:
-                    handlers[message_lower](sender_id, interface)
-                return # Command handled, exit process_message
-            elif state:
-                # Handles multi-message command steps (mail, bulletin, stats, etc.)
-                command = state['command']
-                step = state['step']
-
-                if command == 'MAIL':
-                    handle_mail_steps(sender_id, message, step, state, interface, bbs_nodes)
-                elif command == 'BULLETIN':
-                    handle_bb_steps(sender_id, message, step, state, interface, bbs_nodes)
-                elif command == 'STATS':
-                    handle_stats_steps(sender_id, message, step, interface)
-                elif command == 'CHANNEL_DIRECTORY':
-                    handle_channel_directory_steps(sender_id, message, step, state, interface)
-                elif command == 'CHECK_MAIL':
-                    if step == 1:
-                        handle_read_mail_command(sender_id, message, state, interface)
-                    elif step == 2:
-                        handle_delete_mail_confirmation(sender_id, message, state, interface, bbs_nodes)
-                elif command == 'CHECK_BULLETIN':
-                    if step == 1:
-                        handle_read_bulletin_command(sender_id, message, state, interface)
-                elif command == 'CHECK_CHANNEL':
-                    if step == 1:
-                        handle_read_channel_command(sender_id, message, state, interface)
-                elif command == 'LIST_CHANNELS':
-                    if step == 1:
-                        handle_read_channel_command(sender_id, message, state, interface)
-                elif command == 'BULLETIN_POST':
-                    handle_bb_steps(sender_id, message, 4, state, interface, bbs_nodes)
-                elif command == 'BULLETIN_POST_CONTENT':
-                    handle_bb_steps(sender_id, message, 5, state, interface, bbs_nodes)
-                elif command == 'BULLETIN_READ':
-                    handle_bb_steps(sender_id, message, 3, state, interface, bbs_nodes)
-                elif command == 'JS8CALL_MENU':
-                    handle_js8call_steps(sender_id, message, step, interface, state)
-                elif command == 'GROUP_MESSAGES':
-                    handle_group_message_selection(sender_id, message, step, state, interface)
-                else:
-                    handle_help_command(sender_id, interface) # If the command doesn't match anything, display the help menu
-            else:
-                handle_help_command(sender_id, interface) # If no state and unrecognized command, display the help menu
+        peer = get_node_id_from_num(sender_id, interface)
+        for kind, fields in records:
+            try:
+                process_sync_record(kind, fields, interface, peer)
+            except (IndexError, ValueError) as e:
+                logging.error(f"SERVER SYNC: Malformed {kind} record from {sender_id}: {e}")
+    else:
+        # Logic for processing normal user commands
+        router.dispatch(sender_id, message, message_lower, state, interface, bbs_nodes)
 
 
 def on_receive(packet, interface):
@@ -252,8 +276,7 @@ def on_receive(packet, interface):
             logging.info(f"Received message from user '{sender_short_name}' ({sender_node_id}) to {receiver_short_name}: {message_string}")
 
             bbs_nodes = interface.bbs_nodes
-            is_sync_message = any(message_string.startswith(prefix) for prefix in
-                                  ["BULLETIN|", "MAIL|", "DELETE_BULLETIN|", "DELETE_MAIL|"])
+            is_sync_message = is_sync_text(message_string)
 
             if sender_node_id in bbs_nodes:
                 if is_sync_message:
@@ -0,0 +1,40 @@
+import logging
+import threading
+
+_counters = {}
+_gauges = {}
+_lock = threading.Lock()
+
+
+def increment(name, amount=1):
+    with _lock:
+        _counters[name] = _counters.get(name, 0) + amount
+
+
+def set_gauge(name, value):
+    with _lock:
+        _gauges[name] = value
+
+
+def get(name):
+    with _lock:
+        if name in _gauges:
+            return _gauges[name]
+        return _counters.get(name, 0)
+
+
+def snapshot():
+    """
+    Returns a copy of all counters and gauges.
+    """
+    with _lock:
+        values = dict(_counters)
+        values.update(_gauges)
+        return values
+
+
+def log_summary():
+    values = snapshot()
+    if values:
+        summary = ", ".join(f"{name}={value}" for name, value in sorted(values.items()))
+        logging.info(f"METRICS: {summary}")
@@ -0,0 +1,110 @@
+import logging
+import threading
+
+
+class NodeDirectory:
+    """
+    Indexed view of interface.nodes.
+
+    Keeps num -> node id, node id -> node record and lowercased short name ->
+    [node ids] indexes so that per-message lookups do not scan every known
+    node. The indexes are updated from meshtastic node-update events; if the
+    node table changes size without an event, the next lookup rebuilds them.
+    """
+
+    def __init__(self, interface):
+        self.interface = interface
+        self._lock = threading.RLock()
+        self._id_by_num = {}
+        self._nodes = {}
+        self._ids_by_short_name = {}
+        self._short_name_by_id = {}
+        self._size = -1
+
+    def rebuild(self):
+        with self._lock:
+            self._id_by_num.clear()
+            self._nodes.clear()
+            self._ids_by_short_name.clear()
+            self._short_name_by_id.clear()
+            nodes = self.interface.nodes or {}
+            for node_id, node in list(nodes.items()):
+                self._index(node_id, node)
+            self._size = len(nodes)
+            logging.debug(f"Node directory rebuilt with {self._size} nodes")
+
+    def update_node(self, node):
+        """
+        Updates the indexes for a single node, e.g. from a node-update event.
+        """
+        with self._lock:
+            node_id = node.get('user', {}).get('id') or self._id_by_num.get(node.get('num'))
+            if node_id is None:
+                self._size = -1  # Unknown key, resync on the next lookup
+                return
+            self._unindex(node_id)
+            self._index(node_id, self.interface.nodes.get(node_id, node))
+            self._size = len(self.interface.nodes or {})
+
+    def _index(self, node_id, node):
+        self._nodes[node_id] = node
+        num = node.get('num')
+        if num is not None:
+            self._id_by_num[num] = node_id
+        short_name = node.get('user', {}).get('shortName')
+        if short_name is not None:
+            key = short_name.lower()
+            self._ids_by_short_name.setdefault(key, []).append(node_id)
+            self._short_name_by_id[node_id] = key
+
+    def _unindex(self, node_id):
+        node = self._nodes.pop(node_id, None)
+        if node is None:
+            return
+        if self._id_by_num.get(node.get('num')) == node_id:
+            del self._id_by_num[node['num']]
+        key = self._short_name_by_id.pop(node_id, None)
+        if key is not None:
+            ids = self._ids_by_short_name.get(key, [])
+            if node_id in ids:
+                ids.remove(node_id)
+            if not ids:
+                self._ids_by_short_name.pop(key, None)
+
+    def _ensure_fresh(self):
+        if self._size != len(self.interface.nodes or {}):
+            self.rebuild()
+
+    def id_from_num(self, node_num):
+        with self._lock:
+            self._ensure_fresh()
+            return self._id_by_num.get(node_num)
+
+    def get(self, node_id):
+        with self._lock:
+            self._ensure_fresh()
+            return self._nodes.get(node_id)
+
+    def find_by_short_name(self, short_name):
+        """
+        Returns (node_id, node) pairs whose short name matches, case-insensitively.
+        """
+        with self._lock:
+            self._ensure_fresh()
+            return [(node_id, self._nodes[node_id])
+                    for node_id in self._ids_by_short_name.get(short_name.lower(), [])]
+
+
+def get_node_directory(interface):
+    directory = getattr(interface, 'node_directory', None)
+    if directory is None:
+        directory = NodeDirectory(interface)
+        interface.node_directory = directory
+    return directory
+
+
+def on_node_updated(node, interface):
+    """
+    pubsub callback for 'meshtastic.node.updated'.
+    """
+    get_node_directory(interface).update_node(node)
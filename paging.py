@@ -0,0 +1,23 @@
+# Replies that move through a paged listing (bulletins, mail, JS8Call messages)
+PAGE_COMMANDS = ('n', 'p')
+
+
+def page_state(rows, has_older, has_newer):
+    """
+    Returns the state keys that remember where a listing page starts and ends.
+    """
+    return {'first_id': rows[0][0], 'last_id': rows[-1][0], 'has_older': has_older, 'has_newer': has_newer}
+
+
+def page_cursor(choice, state):
+    """
+    Returns (before_id, after_id) of the page that [N]ext or [P]rev asks for, or None past either end.
+    """
+    if choice == 'n':
+        return (state['last_id'], None) if state.get('has_older') else None
+    return (None, state['first_id']) if state.get('has_newer') else None
+
+
+def page_footer(has_older, has_newer):
+    options = (["[N]ext"] if has_older else []) + (["[P]rev"] if has_newer else [])
+    return f"\n{'  '.join(options)}" if options else ""
@@ -1,8 +1,13 @@
 import random, json, os
 import logging
+import threading
 
 STATE_FILE = "blackjack_state.json" # File to store game states for each player
 
+# Messages are handled on several threads and every game shares STATE_FILE,
+# so a load/modify/save cycle must not interleave with another player's
+_state_lock = threading.RLock()
+
 def deal_card():
     """Returns a random card."""
     cards = [2, 3, 4, 5, 6, 7, 8, 9, 10, 10, 10, 10, 11]
@@ -157,6 +162,10 @@ def handle_message(username, message_text):
     Routes messages to the appropriate game action (deal, hit, stay).
     This function is designed to be called by the main BBS message processor.
     """
+    with _state_lock:
+        return _handle_message(username, message_text)
+
+def _handle_message(username, message_text):
     message_text_lower = message_text.lower().strip()
     logging.info(f"BLACKJACK_DEBUG: handle_message called for user {username} with message '{message_text}'")
 
@@ -0,0 +1,227 @@
+import logging
+import threading
+import time
+from collections import OrderedDict, deque
+
+
+class DeliveryTracker:
+    """
+    Collects the radio acks for the frames of one message and reports the outcome once.
+
+    on_result is called with (True, None) when the destination has acked every
+    frame, or with (False, reason) on the first NAK or failed transmit.
+
+    Only an ack sent by the destination itself counts. When a relay
+    rebroadcasts a frame, our own node answers with an implicit ack that says
+    nothing about the destination; meshtastic hands that ack to on_response
+    and then forgets the request, so the frame is passed to await_ack to wait
+    for the destination's real ack (see OutboundScheduler.on_routing_packet).
+    """
+
+    def __init__(self, frame_count, on_result, destination, await_ack=None):
+        self.remaining = frame_count
+        self.on_result = on_result
+        self.destination = destination
+        self.await_ack = await_ack
+        self._reported = False
+        self._lock = threading.Lock()
+
+    def conclusive(self, packet):
+        """
+        True if a routing packet settles its frame: a NAK, or an ack from the destination.
+        """
+        if packet.get('decoded', {}).get('routing', {}).get('errorReason', 'NONE') != 'NONE':
+            return True
+        return self.destination in (packet.get('from'), packet.get('fromId'))
+
+    def on_response(self, packet):
+        """
+        meshtastic onResponse callback for a single frame.
+        """
+        if not self.conclusive(packet):
+            if self.await_ack is not None:
+                self.await_ack(packet.get('decoded', {}).get('requestId'), self)
+            return
+        reason = packet.get('decoded', {}).get('routing', {}).get('errorReason', 'NONE')
+        if reason != 'NONE':
+            self.fail(reason)
+            return
+        with self._lock:
+            self.remaining -= 1
+            if self.remaining > 0 or self._reported:
+                return
+            self._reported = True
+        self._report(True, None)
+
+    def fail(self, reason):
+        with self._lock:
+            if self._reported:
+                return
+            self._reported = True
+        self._report(False, reason)
+
+    def _report(self, delivered, reason):
+        try:
+            self.on_result(delivered, reason)
+        except Exception as e:
+            logging.error(f"Error in delivery callback: {e}")
+
+
+class OutboundScheduler:
+    """
+    Paces outgoing radio frames on a dedicated worker thread.
+
+    Each destination gets its own FIFO queue so that the frames of one reply
+    always go out in order, while destinations are served round-robin so one
+    long reply cannot starve everybody else. Callers only enqueue and return
+    immediately; pacing and retries happen here.
+
+    Args:
+        transmit (callable): Called as transmit(text, destination, interface, on_response) for every
+            frame. on_response is None unless the sender asked to be told about delivery.
+        pacing (float): Seconds to wait between two frames on the air.
+        max_retries (int): How many times a frame is retried when transmit raises.
+        retry_delay (float): Base delay in seconds between retries, doubled on each attempt.
+        ack_wait (float): Seconds to keep waiting for the destination's ack of a frame that was
+            only acked implicitly; after that the sender's own retry handles it.
+    """
+
+    def __init__(self, transmit, pacing=2.0, max_retries=3, retry_delay=1.0, ack_wait=3600.0):
+        self.transmit = transmit
+        self.pacing = pacing
+        self.max_retries = max_retries
+        self.retry_delay = retry_delay
+        self.ack_wait = ack_wait
+        self._awaiting_ack = OrderedDict()  # request id -> (tracker, when the implicit ack arrived)
+        self._ack_lock = threading.Lock()
+
+        self._queues = OrderedDict()
+        self._condition = threading.Condition()
+        self._worker = None
+        self._running = False
+
+    def start(self):
+        with self._condition:
+            if self._running:
+                return
+            self._running = True
+            self._worker = threading.Thread(target=self._run, name='outbound-scheduler', daemon=True)
+            self._worker.start()
+
+    def stop(self, timeout=None):
+        """
+        Lets the worker send what is queued and stops it. Frames still queued after
+        `timeout` seconds are dropped; with no timeout, waits until every queue is empty.
+        """
+        deadline = None if timeout is None else time.monotonic() + timeout
+        # The worker cannot drain the queues while it is the one waiting for them
+        draining = self._worker is not None and self._worker is not threading.current_thread()
+        with self._condition:
+            while self._queues and draining and self._worker.is_alive():
+                if deadline is None:
+                    self._condition.wait()
+                    continue
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                self._condition.wait(remaining)
+            dropped = sum(len(q) for q in self._queues.values())
+            self._queues.clear()
+            self._running = False
+            self._condition.notify_all()
+        if dropped:
+            logging.info(f"Outbound scheduler stopped with {dropped} unsent frame(s) dropped")
+        if self._worker is not None and self._worker is not threading.current_thread():
+            self._worker.join()
+        self._worker = None
+
+    def enqueue(self, frames, destination, interface, on_result=None):
+        """
+        Queues a sequence of frames for a destination and returns immediately.
+
+        If on_result is given, it is called once the destination has acked every
+        frame, or as soon as one frame is NAKed or cannot be sent (see DeliveryTracker).
+        """
+        frames = list(frames)
+        if not frames:
+            return
+        tracker = DeliveryTracker(len(frames), on_result, destination, self._await_ack) if on_result else None
+        self.start()
+        with self._condition:
+            queue = self._queues.get(destination)
+            if queue is None:
+                queue = self._queues[destination] = deque()
+            queue.extend((frame, interface, tracker) for frame in frames)
+            self._condition.notify()
+
+    def _await_ack(self, request_id, tracker):
+        if request_id is None:
+            return
+        now = time.monotonic()
+        with self._ack_lock:
+            self._awaiting_ack[request_id] = (tracker, now)
+            # Oldest first, so stop at the first frame still worth waiting for
+            while self._awaiting_ack:
+                oldest, (_, since) = next(iter(self._awaiting_ack.items()))
+                if now - since < self.ack_wait:
+                    break
+                del self._awaiting_ack[oldest]
+
+    def on_routing_packet(self, packet, interface):
+        """
+        pubsub callback for 'meshtastic.receive.routing'; passes the destination's ack (or a NAK)
+        of a frame that was only acked implicitly to its tracker.
+        """
+        request_id = packet.get('decoded', {}).get('requestId')
+        with self._ack_lock:
+            entry = self._awaiting_ack.get(request_id)
+            if entry is None or not entry[0].conclusive(packet):
+                return
+            del self._awaiting_ack[request_id]
+        entry[0].on_response(packet)
+
+    def pending(self, destination=None):
+        with self._condition:
+            if destination is None:
+                return sum(len(q) for q in self._queues.values())
+            queue = self._queues.get(destination)
+            return len(queue) if queue else 0
+
+    def _next_frame(self):
+        # Rotate destinations so each one gets a turn between frames
+        destination, queue = next(iter(self._queues.items()))
+        frame, interface, tracker = queue.popleft()
+        if queue:
+            self._queues.move_to_end(destination)
+        else:
+            del self._queues[destination]
+        return destination, frame, interface, tracker
+
+    def _run(self):
+        while True:
+            with self._condition:
+                while self._running and not self._queues:
+                    self._condition.wait()
+                if not self._running:
+                    return
+                destination, frame, interface, tracker = self._next_frame()
+                self._condition.notify_all()
+
+            self._send_with_retry(frame, destination, interface, tracker)
+            time.sleep(self.pacing)
+
+    def _send_with_retry(self, frame, destination, interface, tracker=None):
+        on_response = tracker.on_response if tracker else None
+        for attempt in range(self.max_retries + 1):
+            try:
+                self.transmit(frame, destination, interface, on_response)
+                return
+            except Exception as e:
+                if attempt == self.max_retries or not self._running:
+                    logging.error(f"REPLY SEND ERROR to {destination}, giving up after {attempt + 1} attempt(s): {e}")
+                    if tracker:
+                        tracker.fail(str(e))
+                    return
+                delay = self.retry_delay * (2 ** attempt)
+                logging.warning(f"REPLY SEND ERROR to {destination}: {e}. Retrying in {delay:.0f}s")
+                time.sleep(delay)
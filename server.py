@@ -15,11 +15,20 @@ other BBS servers listed in the config.ini file.
 import logging
 import time
 
-from config_init import initialize_config, get_interface, init_cli_parser, merge_config
-from db_operations import initialize_database
+from config_init import config_manager, get_interface, init_cli_parser
+from db_operations import initialize_database, close_database, database, writes
+from inbound_queue import InboundDispatcher
 from js8call_integration import JS8CallClient
+from js8call_store import close_store as close_js8call_store
 from message_processing import on_receive
+import metrics
+from mesh_stats import get_mesh_stats, on_node_updated as update_mesh_stats, on_packet as count_mesh_packet
+from node_directory import on_node_updated
 from pubsub import pub
+from session_store import SessionJournal
+from sync_outbox import SyncOutbox
+from sync_reconcile import start_reconciliation
+from utils import outbound, sync_batcher, urgent_broadcasts, user_sessions
 
 # General logging
 logging.basicConfig(
@@ -37,6 +46,14 @@ js8call_formatter = logging.Formatter('%(asctime)s - JS8Call - %(levelname)s - %
 js8call_handler.setFormatter(js8call_formatter)
 js8call_logger.addHandler(js8call_handler)
 
+# How often the server logs its counters (sync duplicates, queue depths, ...)
+METRICS_LOG_INTERVAL = 900
+
+# Inbound packets are handled by this many workers, each holding at most
+# INBOUND_QUEUE_SIZE packets before new ones are dropped
+INBOUND_WORKERS = 4
+INBOUND_QUEUE_SIZE = 64
+
 def display_banner():
     banner = """
 ████████╗ ██████╗██████╗       ██████╗ ██████╗ ███████╗
@@ -55,39 +72,83 @@ def main():
     config_file = None
     if args.config is not None:
         config_file = args.config
-    system_config = initialize_config(config_file)
-
-    merge_config(system_config, args)
+    system_config = config_manager.load(config_file, args)
 
     interface = get_interface(system_config)
-    interface.bbs_nodes = system_config['bbs_nodes']
-    interface.allowed_nodes = system_config['allowed_nodes']
+
+    def apply_config(snapshot):
+        interface.bbs_nodes = snapshot['bbs_nodes']
+        interface.sync_format = snapshot['sync_format']
+        interface.allowed_nodes = snapshot['allowed_nodes']
+
+    apply_config(system_config)
+    # Sync peers, the allow list and menus follow edits to the config file (or SIGHUP)
+    config_manager.subscribe(apply_config)
+    config_manager.watch()
 
     logging.info(f"TC²-BBS is running on {system_config['interface_type']} interface...")
 
     initialize_database()
+    outbound.start()
+
+    # Conversations in progress survive a restart
+    session_journal = SessionJournal(database, writes)
+    user_sessions.attach_journal(session_journal)
+
+    # Sync records wait in the database until the peer acks them
+    sync_outbox = SyncOutbox(sync_batcher, database, writes,
+                             backlog_delay=lambda: outbound.pending() * outbound.pacing)
+    sync_batcher.outbox = sync_outbox
+    sync_outbox.start(interface)
+
+    # Keep the radio reader thread free: packets are handled on a worker per sender
+    inbound = InboundDispatcher(on_receive, workers=INBOUND_WORKERS, queue_size=INBOUND_QUEUE_SIZE)
+    inbound.start()
 
     def receive_packet(packet, interface):
-        on_receive(packet, interface)
+        inbound.submit(packet.get('from'), packet, interface)
 
     pub.subscribe(receive_packet, system_config['mqtt_topic'])
+    pub.subscribe(on_node_updated, 'meshtastic.node.updated')
+    # Destination acks of frames that a relay's rebroadcast acked implicitly first
+    pub.subscribe(outbound.on_routing_packet, 'meshtastic.receive.routing')
+
+    # Stats menu counters follow node and packet events instead of rescanning interface.nodes
+    get_mesh_stats(interface)
+    pub.subscribe(count_mesh_packet, system_config['mqtt_topic'])
+    pub.subscribe(update_mesh_stats, 'meshtastic.node.updated')
+
+    # Catch up with peers on everything we missed while offline, then periodically.
+    # Rounds are skipped while no peers are configured.
+    start_reconciliation(interface, system_config['sync_reconcile_interval'])
 
     # Initialize and start JS8Call Client if configured
     js8call_client = JS8CallClient(interface)
     js8call_client.logger = js8call_logger
 
-    if js8call_client.db_conn:
-        js8call_client.connect()
+    if js8call_client.store:
+        js8call_client.start()
+        js8call_client.store.start_retention()
 
     try:
+        last_metrics_log = time.monotonic()
         while True:
             time.sleep(1)
+            if time.monotonic() - last_metrics_log >= METRICS_LOG_INTERVAL:
+                metrics.log_summary()
+                last_metrics_log = time.monotonic()
 
     except KeyboardInterrupt:
         logging.info("Shutting down the server...")
+        inbound.stop(timeout=5)
+        sync_outbox.stop()
+        session_journal.stop()
+        urgent_broadcasts.stop()
+        outbound.stop(timeout=10)
         interface.close()
-        if js8call_client.connected:
-            js8call_client.close()
+        js8call_client.close()
+        close_js8call_store()
+        close_database()
 
 if __name__ == "__main__":
     main()
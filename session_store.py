@@ -0,0 +1,234 @@
+import json
+import logging
+import sys
+import threading
+import time
+from collections import OrderedDict
+
+import metrics
+
+
+def _ids_only(rows):
+    # Menus that list mail, bulletins or groups only need the first column to act on a choice
+    return [(row[0],) for row in rows]
+
+
+# How each bulky state field is shrunk before it is stored. Handlers only
+# read what is kept here, so compacting an already compact value is a no-op.
+COMPACT_FIELDS = {
+    'mail': _ids_only,
+    'bulletins': _ids_only,
+    'groups': _ids_only,
+    'channels': lambda channels: [tuple(channel) for channel in channels],
+    'nodes': lambda nodes: [{'num': node['num']} for node in nodes],
+}
+
+
+def _estimate_size(value):
+    size = sys.getsizeof(value)
+    if isinstance(value, dict):
+        size += sum(_estimate_size(k) + _estimate_size(v) for k, v in value.items())
+    elif isinstance(value, (list, tuple)):
+        size += sum(_estimate_size(item) for item in value)
+    return size
+
+
+class SessionStore:
+    """
+    Conversation state per user, with an idle timeout and a memory cap.
+
+    Sessions are kept in least recently used order. A session that has been
+    idle for `ttl` seconds is dropped the next time the store is touched, and
+    the least recently used sessions are evicted whenever the store holds more
+    than `max_sessions` or its estimated size exceeds `max_bytes`. A user
+    whose session was dropped simply starts again from the main menu.
+
+    When a SessionJournal is attached, every change is also journaled to the
+    database and sessions that are not in memory (after a restart or an
+    eviction) are read back from it on the user's next message.
+
+    Args:
+        ttl (float): Seconds of inactivity after which a session expires.
+        max_sessions (int): Maximum number of sessions kept.
+        max_bytes (int): Approximate memory budget for all sessions.
+    """
+
+    def __init__(self, ttl=3600, max_sessions=500, max_bytes=2 * 1024 * 1024):
+        self.ttl = ttl
+        self.max_sessions = max_sessions
+        self.max_bytes = max_bytes
+        self._sessions = OrderedDict()  # user_id -> [state, last_seen, size]
+        self._bytes = 0
+        self._lock = threading.Lock()
+
+        self.journal = None
+        self._on_disk = set()  # Users whose live session is only in the journal
+
+    def attach_journal(self, journal):
+        """
+        Journals session changes from now on and restores the sessions the journal holds.
+        """
+        on_disk = journal.load_user_ids(self.ttl)
+        with self._lock:
+            self.journal = journal
+            self._on_disk = on_disk
+        logging.info(f"{len(on_disk)} user session(s) can be restored from the journal")
+
+    def get(self, user_id):
+        now = time.monotonic()
+        with self._lock:
+            self._expire(now)
+            entry = self._sessions.get(user_id)
+            if entry is not None:
+                entry[1] = now
+                self._sessions.move_to_end(user_id)
+                return entry[0]
+            if user_id not in self._on_disk:
+                return None
+            self._on_disk.discard(user_id)
+
+        state = self.journal.load(user_id, self.ttl)
+        if state is None:
+            return None
+        with self._lock:
+            if user_id not in self._sessions:
+                self._store(user_id, state, now)
+                self._evict()
+            metrics.increment('sessions.restored')
+            return self._sessions[user_id][0] if user_id in self._sessions else state
+
+    def set(self, user_id, state):
+        now = time.monotonic()
+        with self._lock:
+            self._remove(user_id)
+            self._on_disk.discard(user_id)
+            if state is not None:
+                state = self.compact(state)
+                self._store(user_id, state, now)
+            self._expire(now)
+            self._evict()
+            journal = self.journal
+        if journal is not None:
+            journal.record(user_id, state)
+
+    def __len__(self):
+        with self._lock:
+            return len(self._sessions)
+
+    @staticmethod
+    def compact(state):
+        compacted = dict(state)
+        for field, compact in COMPACT_FIELDS.items():
+            if field in compacted:
+                compacted[field] = compact(compacted[field])
+        return compacted
+
+    def _store(self, user_id, state, now):
+        size = _estimate_size(state)
+        self._sessions[user_id] = [state, now, size]
+        self._bytes += size
+
+    def _remove(self, user_id):
+        entry = self._sessions.pop(user_id, None)
+        if entry is not None:
+            self._bytes -= entry[2]
+
+    def _expire(self, now):
+        # The oldest entries are at the front, so stop at the first one still alive
+        while self._sessions:
+            user_id, entry = next(iter(self._sessions.items()))
+            if now - entry[1] < self.ttl:
+                break
+            self._remove(user_id)
+            metrics.increment('sessions.expired')
+            metrics.set_gauge('sessions.active', len(self._sessions))
+
+    def _evict(self):
+        while self._sessions and (len(self._sessions) > self.max_sessions or self._bytes > self.max_bytes):
+            user_id = next(iter(self._sessions))
+            self._remove(user_id)
+            metrics.increment('sessions.evicted')
+            if self.journal is not None:
+                # Still journaled, so it comes back from disk on the user's next message
+                self._on_disk.add(user_id)
+            logging.info(f"Evicted session of user {user_id} to stay within the session store limits")
+        metrics.set_gauge('sessions.active', len(self._sessions))
+        metrics.set_gauge('sessions.bytes', self._bytes)
+
+
+class SessionJournal:
+    """
+    Append-only record of session changes in the session_journal table.
+
+    Writes go through the WriteBatcher and never wait for the commit, so
+    journaling adds no latency to message handling. Only the newest row per
+    user matters; compact() periodically drops the rest.
+
+    Args:
+        database (ConnectionManager): Read connection for restoring sessions.
+        writes (WriteBatcher): Writer for the journal.
+        compact_interval (float): Seconds between journal compactions.
+    """
+
+    def __init__(self, database, writes, compact_interval=3600):
+        self.database = database
+        self.writes = writes
+        self.compact_interval = compact_interval
+        self.ttl = None
+        self._timer = None
+
+    def record(self, user_id, state):
+        data = None if state is None else json.dumps(state, default=str)
+        self.writes.submit("INSERT INTO session_journal (user_id, state, written_at) VALUES (?, ?, ?)",
+                           (user_id, data, time.time()))
+
+    def load(self, user_id, ttl):
+        """
+        Returns the user's journaled state if it changed less than ttl seconds ago, else None.
+        """
+        # Rare path (restart or eviction): make sure the user's latest change has landed
+        self.writes.flush()
+        c = self.database.reader().cursor()
+        c.execute("SELECT state, written_at FROM session_journal WHERE user_id = ? ORDER BY seq DESC LIMIT 1",
+                  (user_id,))
+        row = c.fetchone()
+        if row is None or row[0] is None or row[1] < time.time() - ttl:
+            return None
+        return json.loads(row[0])
+
+    def load_user_ids(self, ttl):
+        """
+        Returns the users whose newest journaled state is still live, and starts periodic compaction.
+        """
+        self.ttl = ttl
+        self.compact()
+        self.writes.flush()
+        c = self.database.reader().cursor()
+        c.execute("SELECT user_id FROM session_journal WHERE state IS NOT NULL")
+        ids = {row[0] for row in c.fetchall()}
+        self._schedule()
+        return ids
+
+    def compact(self):
+        # Keep only the newest row of each user, and drop it too once cleared or expired
+        self.writes.submit("DELETE FROM session_journal WHERE seq NOT IN "
+                           "(SELECT MAX(seq) FROM session_journal GROUP BY user_id)")
+        self.writes.submit("DELETE FROM session_journal WHERE state IS NULL OR written_at < ?",
+                           (time.time() - self.ttl,))
+
+    def stop(self):
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+
+    def _schedule(self):
+        self._timer = threading.Timer(self.compact_interval, self._run_compaction)
+        self._timer.daemon = True
+        self._timer.start()
+
+    def _run_compaction(self):
+        try:
+            self.compact()
+        except Exception as e:
+            logging.error(f"Session journal compaction failed: {e}")
+        self._schedule()
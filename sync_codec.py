@@ -0,0 +1,228 @@
+import base64
+import uuid
+import zlib
+
+from message_packer import MAX_PAYLOAD_BYTES
+
+# Compact sync frames are sent as text so they travel on the same port as the
+# legacy pipe-delimited messages:
+#
+#   SYNC|<base85(version, sequence, raw deflate(records))>
+#
+# Each record is a type byte followed by length-prefixed UTF-8 fields. When
+# the high bit of the type byte is set, the last field is a unique_id packed
+# as 16 raw UUID bytes instead of its 36 character text form.
+
+SYNC_PREFIX = "SYNC|"
+FORMAT_VERSION = 1
+
+LEGACY_PREFIXES = ("BULLETIN|", "MAIL|", "DELETE_BULLETIN|", "DELETE_MAIL|", "CHANNEL|",
+                   "DIGEST|", "HAVE|", "WANT|")
+
+_RECORD_CODES = {
+    'BULLETIN': 1,
+    'MAIL': 2,
+    'DELETE_BULLETIN': 3,
+    'DELETE_MAIL': 4,
+    'CHANNEL': 5,
+    'DIGEST': 6,
+    'HAVE': 7,
+    'WANT': 8,
+}
+_RECORD_KINDS = {code: kind for kind, code in _RECORD_CODES.items()}
+_PACKED_UUID = 0x80
+
+# Shared deflate dictionary of words that show up in most BBS traffic. Later
+# entries are cheaper to reference, so the most common words come last.
+# Changing this breaks compatibility with peers, bump FORMAT_VERSION if you do.
+_ZDICT = (
+    b"https://meshtastic.org/e/#"
+    b" weather forecast repeater frequency antenna battery solar power"
+    b" meeting tonight tomorrow today please thanks thank you"
+    b" check in net emergency help test testing signal hello everyone"
+    b" bulletin board channel message mail node mesh Meshtastic BBS"
+    b" General Info News Urgent Re: Subject"
+    b" is it in on at to of and the for with from this that you your "
+)
+
+
+def _write_varint(out, value):
+    while value >= 0x80:
+        out.append((value & 0x7f) | 0x80)
+        value >>= 7
+    out.append(value)
+
+
+def _read_varint(data, pos):
+    shift = 0
+    value = 0
+    while True:
+        byte = data[pos]
+        pos += 1
+        value |= (byte & 0x7f) << shift
+        if not byte & 0x80:
+            return value, pos
+        shift += 7
+
+
+def _encode_record(kind, fields):
+    out = bytearray()
+    code = _RECORD_CODES[kind]
+    packed_uuid = None
+    if kind in ('BULLETIN', 'MAIL', 'DELETE_MAIL') and fields:
+        try:
+            packed_uuid = uuid.UUID(fields[-1])
+            if str(packed_uuid) != fields[-1]:
+                packed_uuid = None
+        except ValueError:
+            packed_uuid = None
+
+    if packed_uuid is not None:
+        out.append(code | _PACKED_UUID)
+        text_fields = fields[:-1]
+    else:
+        out.append(code)
+        text_fields = fields
+
+    _write_varint(out, len(text_fields))
+    for field in text_fields:
+        data = str(field).encode('utf-8')
+        _write_varint(out, len(data))
+        out += data
+    if packed_uuid is not None:
+        out += packed_uuid.bytes
+    return bytes(out)
+
+
+def _decode_records(body):
+    records = []
+    pos = 0
+    while pos < len(body):
+        code = body[pos]
+        pos += 1
+        kind = _RECORD_KINDS[code & ~_PACKED_UUID]
+        count, pos = _read_varint(body, pos)
+        fields = []
+        for _ in range(count):
+            length, pos = _read_varint(body, pos)
+            fields.append(body[pos:pos + length].decode('utf-8'))
+            pos += length
+        if code & _PACKED_UUID:
+            fields.append(str(uuid.UUID(bytes=bytes(body[pos:pos + 16]))))
+            pos += 16
+        records.append((kind, fields))
+    return records
+
+
+def _compress(body):
+    compressor = zlib.compressobj(9, zlib.DEFLATED, -15, zdict=_ZDICT)
+    return compressor.compress(body) + compressor.flush()
+
+
+def _decompress(data):
+    decompressor = zlib.decompressobj(-15, zdict=_ZDICT)
+    return decompressor.decompress(data) + decompressor.flush()
+
+
+def encode_frame(records, sequence):
+    """
+    Encodes sync records into one compact text frame.
+
+    Args:
+        records (list): (kind, fields) tuples, e.g. ('BULLETIN', [board, sender, subject, content, unique_id]).
+        sequence (int): Per-peer frame sequence number, wraps at 16 bits.
+
+    Returns:
+        str: The frame text, starting with SYNC_PREFIX.
+    """
+    body = b"".join(_encode_record(kind, fields) for kind, fields in records)
+    payload = bytes([FORMAT_VERSION]) + (sequence & 0xffff).to_bytes(2, 'big') + _compress(body)
+    return SYNC_PREFIX + base64.b85encode(payload).decode('ascii')
+
+
+def decode_frame(text):
+    """
+    Decodes a compact sync frame.
+
+    Returns:
+        tuple: (sequence, records) where records is a list of (kind, fields) tuples.
+
+    Raises:
+        ValueError: If the frame is malformed or uses an unknown format version.
+    """
+    try:
+        payload = base64.b85decode(text[len(SYNC_PREFIX):])
+        if payload[0] != FORMAT_VERSION:
+            raise ValueError(f"unsupported sync frame version {payload[0]}")
+        sequence = int.from_bytes(payload[1:3], 'big')
+        return sequence, _decode_records(_decompress(payload[3:]))
+    except (IndexError, KeyError, UnicodeDecodeError, zlib.error) as e:
+        raise ValueError(f"malformed sync frame: {e}") from e
+
+
+def encode_legacy(kind, fields):
+    return "|".join([kind] + [str(field) for field in fields])
+
+
+def parse_legacy(message):
+    """
+    Splits a legacy pipe-delimited sync message into (kind, fields).
+    """
+    parts = message.split("|")
+    return parts[0], parts[1:]
+
+
+def is_sync_message(message):
+    return message.startswith(SYNC_PREFIX) or message.startswith(LEGACY_PREFIXES)
+
+
+def group_records(records, max_bytes=MAX_PAYLOAD_BYTES):
+    """
+    Splits records into groups that each fit in one compact frame of max_bytes.
+
+    Args:
+        records (list): (kind, fields) tuples in send order.
+        max_bytes (int): Frame byte budget.
+
+    Returns:
+        tuple: (groups, oversized). groups is a list of lists of indexes into
+        records; oversized lists the indexes of records too large for a frame
+        on their own, which must be sent in the legacy format.
+    """
+    groups = []
+    oversized = []
+    batch = []
+    for index, record in enumerate(records):
+        candidate = [records[i] for i in batch] + [record]
+        # The sequence number does not change the frame size, so 0 is fine for measuring
+        if len(encode_frame(candidate, 0)) <= max_bytes:
+            batch.append(index)
+            continue
+        if batch:
+            groups.append(batch)
+        if len(encode_frame([record], 0)) <= max_bytes:
+            batch = [index]
+        else:
+            oversized.append(index)
+            batch = []
+    if batch:
+        groups.append(batch)
+    return groups, oversized
+
+
+def pack_frames(records, next_sequence, max_bytes=MAX_PAYLOAD_BYTES):
+    """
+    Packs as many records per frame as fit in max_bytes.
+
+    Args:
+        records (list): (kind, fields) tuples in send order.
+        next_sequence (callable): Returns the sequence number for each new frame.
+        max_bytes (int): Frame byte budget.
+
+    Returns:
+        tuple: (frames, oversized) where oversized lists records too large for a
+        frame on their own; those must be sent in the legacy format.
+    """
+    groups, oversized = group_records(records, max_bytes)
+    frames = [encode_frame([records[i] for i in group], next_sequence()) for group in groups]
+    return frames, [records[i] for i in oversized]
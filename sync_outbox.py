@@ -0,0 +1,228 @@
+import json
+import logging
+import threading
+import time
+
+import metrics
+from sync_codec import encode_frame, encode_legacy, group_records
+
+
+class SyncOutbox:
+    """
+    Persistent, acknowledged delivery of sync records to BBS peers.
+
+    Every record is stored in the sync_outbox table once per peer and stays
+    there until the peer's radio acks the frame carrying it. Frames that are
+    NAKed or never acked are retransmitted with exponential backoff, and since
+    the table lives in bulletins.db, pending records survive a restart.
+    Receivers drop duplicates by unique_id, so retransmits are harmless.
+
+    Records added with a delay (the SyncBatcher's window in compact mode)
+    become due together when the window that the first of them opened
+    closes, so their first send is packed into as few frames as retransmits are.
+
+    Records are given up on, with a warning, once they have been sent
+    `max_attempts` times or are older than `max_age`, and when their peer is
+    no longer in [sync] bbs_nodes.
+
+    Args:
+        batcher (SyncBatcher): Provides send() and the per-peer frame sequence numbers.
+        database (ConnectionManager): Read connection for the outbox table.
+        writes (WriteBatcher): Writer for the outbox table.
+        backlog_delay (callable): Returns the seconds a frame queued now waits before it
+            goes on the air, so the ack timeout only starts counting from then.
+        ack_timeout (float): Seconds to wait for an ack on the first attempt; doubles per attempt.
+        max_backoff (float): Upper bound on the wait between attempts.
+        poll_interval (float): How often to look for due records when nothing wakes the worker.
+        batch_size (int): Maximum records read from the outbox per pass.
+        max_attempts (int): Sends after which a record is dropped.
+        max_age (float): Seconds after which an unacked record is dropped.
+        expire_interval (float): Seconds between checks for records to give up on.
+    """
+
+    def __init__(self, batcher, database, writes, backlog_delay=lambda: 0, ack_timeout=120,
+                 max_backoff=3600, poll_interval=5, batch_size=50, max_attempts=20,
+                 max_age=7 * 86400, expire_interval=60):
+        self.batcher = batcher
+        self.database = database
+        self.writes = writes
+        self.backlog_delay = backlog_delay
+        self.ack_timeout = ack_timeout
+        self.max_backoff = max_backoff
+        self.poll_interval = poll_interval
+        self.batch_size = batch_size
+        self.max_attempts = max_attempts
+        self.max_age = max_age
+        self.expire_interval = expire_interval
+        self._last_expiry = 0
+
+        self.interface = None
+        self._wake = threading.Event()
+        self._running = False
+        self._worker = None
+        self._window_closes = 0
+        self._window_lock = threading.Lock()
+
+    def add(self, record, peers, delay=0):
+        """
+        Stores a record for every peer. With a delay, it is first sent when the current batching window closes.
+        """
+        kind, fields = record
+        now = time.time()
+        due = self._window_due(now, delay) if delay else now
+        for peer in peers:
+            self.writes.submit(
+                "INSERT INTO sync_outbox (peer, kind, fields, created_at, next_attempt) VALUES (?, ?, ?, ?, ?)",
+                (peer, kind, json.dumps([str(field) for field in fields]), now, due),
+                None if delay else lambda rowcount: self._wake.set())
+
+    def _window_due(self, now, delay):
+        # The first record of a window opens it; later ones join it until it closes
+        with self._window_lock:
+            if self._window_closes <= now:
+                self._window_closes = now + delay
+                timer = threading.Timer(delay, self._wake.set)
+                timer.daemon = True
+                timer.start()
+            return self._window_closes
+
+    def start(self, interface):
+        self.interface = interface
+        if self._running:
+            return
+        self._running = True
+        self._worker = threading.Thread(target=self._run, name='sync-outbox', daemon=True)
+        self._worker.start()
+
+    def stop(self):
+        self._running = False
+        self._wake.set()
+        if self._worker is not None:
+            self._worker.join()
+            self._worker = None
+
+    def _run(self):
+        while self._running:
+            self._wake.wait(self.poll_interval)
+            self._wake.clear()
+            if not self._running:
+                return
+            try:
+                if time.monotonic() - self._last_expiry >= self.expire_interval:
+                    self._last_expiry = time.monotonic()
+                    self.expire()
+                self._send_due()
+                self._update_gauges()
+            except Exception as e:
+                logging.error(f"SERVER SYNC: Outbox pass failed: {e}")
+
+    def expire(self):
+        """
+        Drops the records of peers that are no longer configured and those past max_attempts or max_age.
+
+        Returns:
+            int: The number of records dropped.
+        """
+        peers = list(getattr(self.interface, 'bbs_nodes', None) or [])
+        if self.interface is None:
+            unconfigured, peer_params = "0", []
+        elif peers:
+            unconfigured, peer_params = f"peer NOT IN ({','.join('?' * len(peers))})", peers
+        else:
+            unconfigured, peer_params = "1", []
+        where = f"{unconfigured} OR attempts >= ? OR created_at < ?"
+        params = peer_params + [self.max_attempts, time.time() - self.max_age]
+
+        c = self.database.reader().cursor()
+        c.execute(f"SELECT peer, kind, CASE WHEN {unconfigured} THEN 'peer' WHEN attempts >= ? THEN 'attempts' "
+                  f"ELSE 'age' END AS reason, COUNT(*) FROM sync_outbox WHERE {where} GROUP BY peer, kind, reason",
+                  peer_params + [self.max_attempts] + params)
+        expired = c.fetchall()
+        if not expired:
+            return 0
+        dropped = self.writes.execute(f"DELETE FROM sync_outbox WHERE {where}", params)
+        reasons = {
+            'peer': "no longer a configured peer",
+            'attempts': f"not acked after {self.max_attempts} attempts",
+            'age': f"not acked within {self.max_age / 86400:g} days",
+        }
+        for peer, kind, reason, count in expired:
+            logging.warning(f"SERVER SYNC: Giving up on {count} {kind} record(s) for {peer}: {reasons[reason]}")
+        metrics.increment('sync.expired', dropped)
+        return dropped
+
+    def _backoff(self, attempts):
+        return min(self.ack_timeout * (2 ** max(attempts - 1, 0)), self.max_backoff)
+
+    def _send_due(self):
+        c = self.database.reader().cursor()
+        c.execute("SELECT id, peer, kind, fields, attempts FROM sync_outbox WHERE next_attempt <= ? ORDER BY id LIMIT ?",
+                  (time.time(), self.batch_size))
+        rows = c.fetchall()
+
+        by_peer = {}
+        for row_id, peer, kind, fields, attempts in rows:
+            by_peer.setdefault(peer, []).append((row_id, (kind, json.loads(fields)), attempts))
+
+        compact = getattr(self.interface, 'sync_format', 'legacy') == 'compact'
+        for peer, entries in by_peer.items():
+            records = [record for _, record, _ in entries]
+            if compact:
+                groups, oversized = group_records(records)
+            else:
+                groups, oversized = [], list(range(len(records)))
+
+            for group in groups:
+                text = encode_frame([records[i] for i in group], self.batcher.next_sequence(peer))
+                self._send(text, peer, [entries[i] for i in group])
+            for index in oversized:
+                self._send(encode_legacy(*records[index]), peer, [entries[index]])
+
+    def _send(self, text, peer, entries):
+        ids = [row_id for row_id, _, _ in entries]
+        attempts = max(attempts for _, _, attempts in entries) + 1
+        retransmits = sum(1 for _, _, previous in entries if previous)
+        if retransmits:
+            metrics.increment('sync.retransmits', retransmits)
+
+        # Do not look at these rows again until the ack window has passed
+        deadline = time.time() + self.backlog_delay() + self._backoff(attempts)
+        placeholders = ",".join("?" * len(ids))
+        self.writes.execute(
+            f"UPDATE sync_outbox SET attempts = attempts + 1, next_attempt = ? WHERE id IN ({placeholders})",
+            [deadline] + ids)
+
+        def on_result(delivered, reason):
+            if delivered:
+                metrics.increment('sync.acks')
+                self.writes.submit(f"DELETE FROM sync_outbox WHERE id IN ({placeholders})", ids)
+            else:
+                metrics.increment('sync.naks')
+                logging.warning(f"SERVER SYNC: {peer} did not ack {len(ids)} record(s) ({reason}), "
+                                f"retrying in {self._backoff(attempts):.0f}s")
+                self.writes.submit(f"UPDATE sync_outbox SET next_attempt = ? WHERE id IN ({placeholders})",
+                                   [time.time() + self._backoff(attempts)] + ids)
+
+        self.batcher.send(text, peer, self.interface, on_result=on_result)
+        metrics.increment('sync.records_sent', len(ids))
+        metrics.increment('sync.frames_sent')
+
+    def _update_gauges(self):
+        depths = self.link_health()
+        metrics.set_gauge('sync.outbox_depth', sum(depth for depth, _ in depths.values()))
+        for peer, (depth, oldest) in depths.items():
+            metrics.set_gauge(f'sync.outbox_depth.{peer}', depth)
+            metrics.set_gauge(f'sync.outbox_oldest_seconds.{peer}', int(oldest))
+        for peer in self.interface.bbs_nodes if self.interface else []:
+            if peer not in depths:
+                metrics.set_gauge(f'sync.outbox_depth.{peer}', 0)
+                metrics.set_gauge(f'sync.outbox_oldest_seconds.{peer}', 0)
+
+    def link_health(self):
+        """
+        Returns {peer: (pending records, age in seconds of the oldest pending record)}.
+        """
+        c = self.database.reader().cursor()
+        c.execute("SELECT peer, COUNT(*), MIN(created_at) FROM sync_outbox GROUP BY peer")
+        now = time.time()
+        return {peer: (count, now - oldest) for peer, count, oldest in c.fetchall()}
@@ -0,0 +1,189 @@
+import hashlib
+import logging
+import threading
+
+import metrics
+from config_init import config_manager
+from db_operations import (
+    get_bulletins_by_id_prefix, get_mail_by_id_prefix, get_sync_ids
+)
+from utils import send_bulletin_to_bbs_nodes, send_mail_to_bbs_nodes, sync_batcher
+
+# Catch-up sync between BBS peers.
+#
+# The unique_ids of each table (live records plus deletion tombstones) are
+# split into ranges by their leading hex digits. A DIGEST record carries the
+# count and a short XOR hash of each of the 16 sub-ranges under a prefix:
+#
+#   DIGEST|<scope>|<prefix>|<count.hash>,<count.hash>,...   (16 entries, '' when empty)
+#
+# The receiver answers every sub-range that differs: with a DIGEST one level
+# deeper while the range is large, otherwise with HAVE listing its short ids
+# in that range. The side that gets HAVE pushes the records the peer lacks and
+# asks for the ones it lacks itself with WANT. Matching ranges cost nothing, so
+# two peers that are in sync exchange a single frame per table.
+
+SCOPES = {'b': 'bulletins', 'm': 'mail'}
+HEX_DIGITS = '0123456789abcdef'
+SHORT_ID_LENGTH = 8
+HAVE_LIMIT = 16
+
+
+def _hash_id(unique_id):
+    return int.from_bytes(hashlib.sha1(unique_id.encode('utf-8')).digest()[:3], 'big')
+
+
+def _summarize(ids, prefix):
+    """
+    Returns [(count, hash)] for the 16 sub-ranges of prefix.
+    """
+    summary = [[0, 0] for _ in HEX_DIGITS]
+    depth = len(prefix)
+    for unique_id in ids:
+        digit = HEX_DIGITS.find(unique_id[depth:depth + 1].lower())
+        if digit < 0:
+            continue  # Not a UUID-style id; it can only be synced by push
+        summary[digit][0] += 1
+        summary[digit][1] ^= _hash_id(unique_id)
+    return summary
+
+
+def _format_summary(summary):
+    return ",".join(f"{count:x}.{digest:06x}" if count else "" for count, digest in summary)
+
+
+def _parse_summary(text):
+    summary = []
+    for entry in text.split(","):
+        if entry:
+            count, digest = entry.split(".")
+            summary.append([int(count, 16), int(digest, 16)])
+        else:
+            summary.append([0, 0])
+    if len(summary) != len(HEX_DIGITS):
+        raise ValueError(f"expected {len(HEX_DIGITS)} digest entries, got {len(summary)}")
+    return summary
+
+
+def send_digest(scope, prefix, peer, interface, ids=None):
+    if ids is None:
+        ids = get_sync_ids(SCOPES[scope], prefix)
+    summary = _format_summary(_summarize(ids, prefix))
+    sync_batcher.queue(('DIGEST', [scope, prefix, summary]), [peer], interface)
+    metrics.increment('sync.digests_sent')
+
+
+def _short_ids(ids):
+    return {unique_id[:SHORT_ID_LENGTH].lower(): unique_id for unique_id in ids}
+
+
+def handle_digest(peer, fields, interface):
+    scope, prefix, remote_summary = fields[0], fields[1].lower(), _parse_summary(fields[2])
+    ids = get_sync_ids(SCOPES[scope], prefix)
+    local_summary = _summarize(ids, prefix)
+
+    for digit, (local, remote) in enumerate(zip(local_summary, remote_summary)):
+        if local == remote:
+            continue
+        child = prefix + HEX_DIGITS[digit]
+        child_ids = [unique_id for unique_id in ids if unique_id[:len(child)].lower() == child]
+        if local[0] > HAVE_LIMIT and len(child) < SHORT_ID_LENGTH:
+            send_digest(scope, child, peer, interface, child_ids)
+        else:
+            short_ids = ",".join(sorted(_short_ids(child_ids)))
+            sync_batcher.queue(('HAVE', [scope, child, short_ids]), [peer], interface)
+
+
+def handle_have(peer, fields, interface):
+    scope, prefix = fields[0], fields[1].lower()
+    remote = {short_id for short_id in fields[2].split(",") if short_id}
+    local = _short_ids(get_sync_ids(SCOPES[scope], prefix))
+
+    missing_remote = [short_id for short_id in local if short_id not in remote]
+    missing_local = sorted(remote - set(local))
+
+    if missing_remote:
+        push_records(scope, missing_remote, peer, interface)
+    if missing_local:
+        logging.info(f"SERVER SYNC: Requesting {len(missing_local)} missing {SCOPES[scope]} record(s) from {peer}")
+        sync_batcher.queue(('WANT', [scope, ",".join(missing_local)]), [peer], interface)
+
+
+def handle_want(peer, fields, interface):
+    scope = fields[0]
+    short_ids = [short_id for short_id in fields[1].lower().split(",") if short_id]
+    push_records(scope, short_ids, peer, interface)
+
+
+def push_records(scope, short_ids, peer, interface):
+    """
+    Sends the live records matching `short_ids` to a single peer.
+    Deleted records only have a tombstone and are skipped.
+    """
+    if scope == 'b':
+        records = get_bulletins_by_id_prefix(short_ids)
+        for board, sender_short_name, subject, content, unique_id in records:
+            send_bulletin_to_bbs_nodes(board, sender_short_name, subject, content, unique_id, [peer], interface)
+    else:
+        records = get_mail_by_id_prefix(short_ids)
+        for sender, sender_short_name, recipient, subject, content, unique_id in records:
+            send_mail_to_bbs_nodes(sender, sender_short_name, recipient, subject, content, unique_id, [peer], interface)
+    if records:
+        logging.info(f"SERVER SYNC: Catch-up sent {len(records)} {SCOPES[scope]} record(s) to {peer}")
+        metrics.increment('sync.catchup_records_sent', len(records))
+
+
+def reconcile_with_peers(interface):
+    """
+    Starts a catch-up round by sending the root digest of every table to every peer.
+    """
+    for peer in interface.bbs_nodes:
+        for scope in SCOPES:
+            send_digest(scope, '', peer, interface)
+
+
+def start_reconciliation(interface, interval, initial_delay=60):
+    """
+    Runs reconcile_with_peers after `initial_delay` seconds and then every `interval` seconds.
+
+    A config reload that changes [sync] reconcile_interval reschedules the next
+    round to the new interval, counted from the reload.
+    """
+    lock = threading.Lock()
+    state = {'interval': interval, 'timer': None, 'started': False}
+
+    def run():
+        with lock:
+            if state['timer'] is not threading.current_thread():
+                return  # Replaced by a reschedule
+            state['started'] = True
+        try:
+            if interface.bbs_nodes:
+                reconcile_with_peers(interface)
+        except Exception as e:
+            logging.error(f"SERVER SYNC: Catch-up round failed: {e}")
+        with lock:
+            if state['timer'] is threading.current_thread():
+                schedule(state['interval'])
+
+    def schedule(delay):
+        timer = threading.Timer(delay, run)
+        timer.daemon = True
+        state['timer'] = timer
+        timer.start()
+
+    def apply_config(snapshot):
+        interval = snapshot['sync_reconcile_interval']
+        with lock:
+            if interval == state['interval']:
+                return
+            state['interval'] = interval
+            # Before the first round, the startup round still runs as planned
+            if state['started']:
+                state['timer'].cancel()
+                schedule(interval)
+        logging.info(f"SERVER SYNC: Catch-up rounds now run every {interval}s")
+
+    with lock:
+        schedule(initial_delay)
+    config_manager.subscribe(apply_config)
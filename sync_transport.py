@@ -0,0 +1,106 @@
+import logging
+import threading
+
+import metrics
+from sync_codec import encode_legacy, pack_frames
+
+
+# Records that change stored data and must reach every peer
+DURABLE_KINDS = {'BULLETIN', 'MAIL', 'DELETE_BULLETIN', 'DELETE_MAIL', 'CHANNEL'}
+
+
+class SyncBatcher:
+    """
+    Collects outgoing sync records per peer and sends them as compact frames.
+
+    Records queued for a peer within `window` seconds are packed together,
+    several per frame. Peers only see compact frames when the interface's
+    sync_format is 'compact'; otherwise every record goes out immediately in
+    the legacy pipe-delimited format.
+
+    When a SyncOutbox is attached, records that change data (see
+    DURABLE_KINDS) are handed to it instead, so they are retransmitted until
+    the peer acks them. The outbox holds them for the same window before the
+    first send, so they are packed together too.
+
+    Args:
+        send (callable): Called as send(text, node_id, interface, on_result=None) for every frame.
+        window (float): Seconds to wait for more records before flushing a peer.
+    """
+
+    def __init__(self, send, window=5.0):
+        self.send = send
+        self.window = window
+        self.outbox = None
+        self._pending = {}
+        self._timers = {}
+        self._sequences = {}
+        self._lock = threading.Lock()
+        self._sequence_lock = threading.Lock()
+
+    def queue(self, record, bbs_nodes, interface):
+        compact = getattr(interface, 'sync_format', 'legacy') == 'compact'
+        if self.outbox is not None and record[0] in DURABLE_KINDS:
+            self.outbox.add(record, bbs_nodes, delay=self.window if compact else 0)
+            return
+
+        if not compact:
+            message = encode_legacy(*record)
+            for node_id in bbs_nodes:
+                self.send(message, node_id, interface)
+            return
+
+        with self._lock:
+            for node_id in bbs_nodes:
+                self._pending.setdefault(node_id, []).append(record)
+                if node_id not in self._timers:
+                    timer = threading.Timer(self.window, self.flush, args=(node_id, interface))
+                    timer.daemon = True
+                    self._timers[node_id] = timer
+                    timer.start()
+
+    def next_sequence(self, node_id):
+        with self._sequence_lock:
+            sequence = self._sequences.get(node_id, 0)
+            self._sequences[node_id] = (sequence + 1) & 0xffff
+            return sequence
+
+    def flush(self, node_id, interface):
+        with self._lock:
+            records = self._pending.pop(node_id, [])
+            timer = self._timers.pop(node_id, None)
+            if timer is not None:
+                timer.cancel()
+            frames, oversized = pack_frames(records, lambda: self.next_sequence(node_id))
+
+        for frame in frames:
+            self.send(frame, node_id, interface)
+        for record in oversized:
+            self.send(encode_legacy(*record), node_id, interface)
+        if records:
+            metrics.increment('sync.records_sent', len(records))
+            metrics.increment('sync.frames_sent', len(frames) + len(oversized))
+            logging.info(f"SERVER SYNC: Sent {len(records)} record(s) to {node_id} in {len(frames) + len(oversized)} frame(s)")
+
+
+class SequenceTracker:
+    """
+    Tracks the frame sequence numbers received from each peer and counts gaps.
+    """
+
+    def __init__(self):
+        self._last = {}
+        self._lock = threading.Lock()
+
+    def observe(self, peer, sequence):
+        with self._lock:
+            last = self._last.get(peer)
+            self._last[peer] = sequence
+        if last is None:
+            return 0
+        missed = (sequence - last - 1) & 0xffff
+        if missed and missed < 0x8000:
+            metrics.increment('sync.sequence_gaps', missed)
+            logging.warning(f"SERVER SYNC: {missed} frame(s) missing from {peer} before sequence {sequence}")
+            return missed
+        return 0
@@ -0,0 +1,152 @@
+import logging
+import queue
+import threading
+import time
+
+
+class PendingWrite:
+    """
+    Handle for a statement submitted to a WriteBatcher.
+
+    wait() returns once the batch containing the statement has committed.
+    rowcount and error are filled in at that point.
+    """
+
+    def __init__(self, sql, params, on_commit):
+        self.sql = sql
+        self.params = params
+        self.on_commit = on_commit
+        self.rowcount = None
+        self.error = None
+        self._done = threading.Event()
+
+    def wait(self, timeout=None):
+        if not self._done.wait(timeout):
+            raise TimeoutError(f"Write not committed within {timeout}s")
+        if self.error is not None:
+            raise self.error
+        return self.rowcount
+
+    @property
+    def done(self):
+        return self._done.is_set()
+
+
+class WriteBatcher:
+    """
+    Group-commits single-row writes.
+
+    Statements submitted within `window` seconds of each other, up to
+    `max_rows`, are executed in one transaction on the writer connection,
+    so a burst of sync inserts costs one fsync instead of one per row.
+    A statement is only reported as done (and its on_commit callback only
+    runs) after the transaction holding it has committed; a crash before
+    that leaves the whole batch out, never half of it.
+
+    Args:
+        manager (ConnectionManager): Provides the writer connection.
+        window (float): How long to keep collecting after the first statement arrives.
+        max_rows (int): Upper bound on statements per transaction.
+    """
+
+    def __init__(self, manager, window=0.05, max_rows=500):
+        self.manager = manager
+        self.window = window
+        self.max_rows = max_rows
+        self._queue = queue.Queue()
+        self._worker = None
+        self._start_lock = threading.Lock()
+
+    def start(self):
+        with self._start_lock:
+            if self._worker is None or not self._worker.is_alive():
+                self._worker = threading.Thread(target=self._run, name='write-batcher', daemon=True)
+                self._worker.start()
+
+    def submit(self, sql, params=(), on_commit=None):
+        """
+        Queues a statement and returns a PendingWrite without waiting for the commit.
+
+        on_commit, if given, is called with the statement's rowcount after the batch commits.
+        """
+        pending = PendingWrite(sql, params, on_commit)
+        self.start()
+        self._queue.put(pending)
+        return pending
+
+    def execute(self, sql, params=()):
+        """
+        Submits a statement and waits for its batch to commit. Returns the rowcount.
+        """
+        return self.submit(sql, params).wait()
+
+    def pending(self):
+        return self._queue.qsize()
+
+    def flush(self):
+        """
+        Blocks until everything submitted so far has committed.
+        """
+        if self._worker is None or self._worker is threading.current_thread():
+            return
+        self.submit(None).wait()
+
+    def stop(self):
+        if self._worker is None:
+            return
+        self._queue.put(None)
+        self._worker.join()
+        self._worker = None
+
+    def _collect(self, first):
+        batch = [first]
+        deadline = time.monotonic() + self.window
+        while len(batch) < self.max_rows:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                item = self._queue.get(timeout=remaining)
+            except queue.Empty:
+                break
+            if item is None:
+                self._queue.put(None)  # Re-queue the stop marker for the run loop
+                break
+            batch.append(item)
+            if item.sql is None:
+                break  # A flush marker closes the batch early
+        return batch
+
+    def _run(self):
+        while True:
+            first = self._queue.get()
+            if first is None:
+                return
+            batch = self._collect(first)
+            self._commit(batch)
+
+    def _commit(self, batch):
+        try:
+            with self.manager.writer() as conn:
+                for item in batch:
+                    if item.sql is None:
+                        continue
+                    try:
+                        item.rowcount = conn.execute(item.sql, item.params).rowcount
+                    except Exception as e:
+                        # A failed statement only undoes itself; the rest of the batch still commits
+                        logging.error(f"Batched statement failed: {e}")
+                        item.error = e
+        except Exception as e:
+            logging.error(f"Batched write of {len(batch)} statement(s) failed: {e}")
+            for item in batch:
+                if item.error is None:
+                    item.error = e
+
+        for item in batch:
+            if item.on_commit is not None and item.error is None:
+                try:
+                    item.on_commit(item.rowcount)
+                except Exception as e:
+                    logging.error(f"Error in post-commit callback: {e}")
+            item._done.set()